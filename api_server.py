@@ -0,0 +1,308 @@
+"""Headless JSON API for the image, report and symptom analyses.
+
+    python api_server.py [--host 127.0.0.1] [--port 8600]
+
+Endpoints:
+    POST /v1/symptoms   {"symptoms": [...], "duration": "...", "severity": "..."}
+    POST /v1/image      raw image or DICOM bytes (Content-Type image/* or application/dicom, optional
+                        ?frame=N), or {"image_base64": "...", "frame": N}
+    POST /v1/report     raw PDF/TXT/CSV bytes with its Content-Type (or ?filename=report.csv),
+                        or {"filename": "...", "content_base64": "..."}
+    POST /v1/follow-up  {"analysis": "image", "result": "<text of an earlier analysis>", "question": "..."}
+                        or {"history": [...], "question": "..."} to continue; the response carries the
+                        updated history (text turns only, the original image or report is never resent)
+    GET  /healthz
+    GET  /metrics       JSON snapshot; Prometheus text with ?format=prometheus or Accept: text/plain
+
+Analyses run on a bounded thread pool sharing the process-wide model client, caches and metrics
+with every other caller of diagnosis_core. When all workers are busy and the wait queue is full the
+server answers 429 with Retry-After instead of queueing without limit.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import config
+import diagnosis_core
+import metrics
+from model_client import CircuitOpenError, ModelError, ModelTimeoutError, TransientModelError
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    @property
+    def content_type(self):
+        return self.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    def json(self):
+        try:
+            payload = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+        return payload
+
+
+def _field(payload, name, kind, default=None):
+    # JSON values arrive untyped; reject the wrong type here rather than failing deep in the analysis
+    value = payload.get(name)
+    if value is None:
+        return default
+    if kind is list:
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a list of strings")
+    elif not isinstance(value, kind):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a string")
+    return value
+
+
+def _decode_base64(value, field_name):
+    try:
+        return base64.b64decode(value or "", validate=True)
+    except (binascii.Error, TypeError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{field_name} must be base64")
+
+
+# HANDLERS (run on worker threads)
+
+
+def handle_symptoms(request):
+    payload = request.json()
+    return diagnosis_core.analyze_symptoms(
+        _field(payload, "symptoms", list, []), _field(payload, "duration", str), _field(payload, "severity", str)
+    ).to_dict()
+
+
+def handle_image(request):
+    if request.content_type == "application/json":
+        payload = request.json()
+        data = _decode_base64(_field(payload, "image_base64", str), "image_base64")
+        frame = payload.get("frame")
+    else:
+        data = request.body
+        frame = request.query.get("frame", [None])[0]
+    try:
+        frame = None if frame is None else int(frame)
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "frame must be an integer")
+    return diagnosis_core.analyze_image(data, frame=frame).to_dict()
+
+
+def handle_report(request):
+    if request.content_type == "application/json":
+        payload = request.json()
+        filename = _field(payload, "filename", str, "")
+        data = _decode_base64(_field(payload, "content_base64", str), "content_base64")
+        content_type = ""
+    else:
+        filename = request.query.get("filename", [""])[0]
+        data = request.body
+        content_type = request.content_type
+    return diagnosis_core.analyze_report(data, filename, content_type).to_dict()
+
+
+def handle_follow_up(request):
+    payload = request.json()
+    question = _field(payload, "question", str)
+    history = payload.get("history")
+    if history is None:
+        if not isinstance(payload.get("result"), str) or not payload["result"]:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Send the result to ask about, or the history of an earlier follow-up")
+        history = diagnosis_core.start_conversation(_field(payload, "analysis", str) or "earlier", payload["result"])
+    elif not isinstance(history, list) or not all(
+        isinstance(turn, dict) and turn.get("role") in ("user", "model")
+        and isinstance(turn.get("parts"), list) and all(isinstance(part, str) for part in turn["parts"])
+        for turn in history
+    ):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "history must be a list of {role, parts} text turns")
+    result = diagnosis_core.follow_up(history, question)
+    return {**result.to_dict(), "history": history}
+
+
+ROUTES = {
+    ("POST", "/v1/symptoms"): ("symptoms", handle_symptoms),
+    ("POST", "/v1/image"): ("image", handle_image),
+    ("POST", "/v1/report"): ("report", handle_report),
+    ("POST", "/v1/follow-up"): ("follow_up", handle_follow_up),
+}
+
+
+# SERVER
+
+
+class APIServer:
+    def __init__(self, max_concurrent=None, max_queue=None, max_body_bytes=None):
+        self.max_concurrent = max_concurrent or config.API_MAX_CONCURRENT
+        self.max_queue = config.API_MAX_QUEUE if max_queue is None else max_queue
+        self.max_body_bytes = max_body_bytes or config.API_MAX_BODY_BYTES
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="api-worker")
+        self._slots = None
+        self._admitted = 0
+
+    async def run_analysis(self, name, handler, request):
+        # Backpressure: at most max_concurrent running plus max_queue waiting, everything else gets 429
+        if self._admitted >= self.max_concurrent + self.max_queue:
+            metrics.increment("api_rejected_total", endpoint=name)
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "Server is busy, please retry", {"Retry-After": "1"})
+        self._admitted += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, handler, request)
+        finally:
+            self._admitted -= 1
+
+    async def dispatch(self, request):
+        if request.method == "GET" and request.path == "/healthz":
+            return HTTPStatus.OK, {"status": "ok", "in_flight": self._admitted}
+        if request.method == "GET" and request.path == "/metrics":
+            if request.query.get("format") == ["prometheus"] or "text/plain" in request.headers.get("accept", ""):
+                return HTTPStatus.OK, metrics.to_prometheus()
+            return HTTPStatus.OK, metrics.snapshot()
+
+        route = ROUTES.get((request.method, request.path))
+        if route is None:
+            if any(path == request.path for _, path in ROUTES):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Not found")
+        name, handler = route
+        start = time.perf_counter()
+        try:
+            body = await self.run_analysis(name, handler, request)
+        except diagnosis_core.InvalidRequest as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        except CircuitOpenError as e:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, str(e), {"Retry-After": str(int(config.CIRCUIT_RESET_SECONDS))})
+        except ModelTimeoutError:
+            metrics.increment("api_upstream_errors_total", endpoint=name)
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, "The model did not answer in time, please retry")
+        except TransientModelError:
+            # Still failing after the client's retries; don't leak the backend's message to callers
+            metrics.increment("api_upstream_errors_total", endpoint=name)
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "The model is temporarily unavailable, please retry", {"Retry-After": "1"})
+        except ModelError:
+            metrics.increment("api_upstream_errors_total", endpoint=name)
+            raise HTTPError(HTTPStatus.BAD_GATEWAY, "The model backend returned an error")
+        metrics.observe("api_request_seconds", time.perf_counter() - start, endpoint=name)
+        return HTTPStatus.OK, body
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request body exceeds {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return Request(method.upper(), url.path, parse_qs(url.query), headers, body), keep_alive
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 keep-alive: one connection serves many requests
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    parsed = await self.read_request(reader)
+                    if parsed is None:
+                        break
+                    request, keep_alive = parsed
+                    status, body = await self.dispatch(request)
+                    extra = {}
+                except HTTPError as e:
+                    status, body, extra = e.status, {"error": e.message}, e.headers
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    metrics.increment("api_errors_total")
+                    status, body, extra = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}, {}
+                await self.write_response(writer, status, body, extra, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def write_response(self, writer, status, body, extra_headers, keep_alive):
+        if isinstance(body, str):
+            payload, content_type = body.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            payload, content_type = json.dumps(body, default=str).encode("utf-8"), "application/json"
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(payload)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **extra_headers,
+        }
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + payload)
+        await writer.drain()
+
+    async def serve(self, host, port):
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        metrics.start_exporters()
+        # Build the model client up front so the first request does not pay for it
+        diagnosis_core.get_client()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--max-concurrent", type=int, default=config.API_MAX_CONCURRENT)
+    parser.add_argument("--max-queue", type=int, default=config.API_MAX_QUEUE)
+    args = parser.parse_args(argv)
+
+    server = APIServer(args.max_concurrent, args.max_queue)
+    print(f"Serving MediScan API on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,566 +1,860 @@
-import streamlit as st
-from pathlib import Path
-import base64
-import google.generativeai as genai
-from api_key import api_key
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from PIL import Image
-from datetime import datetime
-
-
-# Configure Gemini model
-genai.configure(api_key=api_key)
-
-# Generation config
-generation_config = {
-    "temperature": 0.4,
-    "top_p": 1,
-    "top_k": 32,
-    "max_output_tokens": 4096
-}
-
-safety_settings = [
-    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-]
-
-system_prompt = """You are a professional AI Medical Health Assistant. Your purpose is to provide clear, evidence-based general health information and predictive insights based on symptoms, medical history, and lifestyle factors shared by the user.
-
-Your key responsibilities include:
-
-Support, Not Diagnose:
-
-You do not provide medical diagnoses or treatment plans.
-
-You do help users better understand possible health conditions, explain medical concepts, and suggest appropriate next steps such as lifestyle adjustments or when to consult a healthcare professional.
-
-Evidence-Based Guidance:
-
-All information should be grounded in current, reputable clinical sources (e.g., CDC, WHO, Mayo Clinic, NICE guidelines).
-
-Where relevant, cite standard clinical practices or widely accepted health recommendations.
-
-Clear and Compassionate Communication:
-
-Use language that is simple, respectful, and reassuring—never alarming.
-
-If uncertainty exists, acknowledge it honestly and encourage the user to seek professional medical advice.
-
-Always emphasize that no online tool can replace a qualified healthcare provider.
-
-Privacy and Safety First:
-
-Do not store, retain, or share any personal health information.
-
-Avoid speculative or unsafe suggestions, even if prompted.
-
-When in doubt, prioritize safety and recommend professional evaluation.
-
-Scope and Boundaries:
-
-Avoid making assumptions or offering unsupported conclusions.
-
-Do not interpret lab results, imaging, or conduct risk assessments unless explicitly supported by clinical guidelines and generalizable data.
-
-Example Disclaimer (to include in interactions):
-“Please note: I am an AI health assistant and not a licensed medical professional. The information I provide is for general guidance only and should not be considered a medical diagnosis or a substitute for professional medical advice. If you are experiencing symptoms or have health concerns, please consult a licensed healthcare provider promptly.” """
-
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=generation_config,
-    safety_settings=safety_settings
-)
-
-
-# SETUP & CONFIGURATION
-
-
-# Page config
-st.set_page_config(
-    page_title="MediScan AI - Advanced Medical Diagnosis",
-    layout="wide",
-    page_icon="🩺",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS
-def local_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-local_css(r"C:\Users\MR COMPUTER\Desktop\My Projects\medical_detection_app\style.css")
-
-
-# SESSION STATE & NAVIGATION
-
-
-if "page" not in st.session_state:
-    st.session_state.page = "Home"
-
-
-# PAGE COMPONENTS
-
-
-def sidebar():
-    with st.sidebar:
-        st.image(r"C:\Users\MR COMPUTER\Desktop\My Projects\medical_detection_app\Screenshot 2025-04-28 224724.png", use_container_width=True)
-        
-        st.markdown("""
-        <div class="sidebar-section">
-            <h3 class="sidebar-header">Navigation</h3>
-            <ul class="sidebar-menu">
-        """, unsafe_allow_html=True)
-        
-        menu_items = {
-            "Home": "",
-            "AI Diagnosis": "",
-            "Health Insights": "",
-            "Disease Encyclopedia": "",
-            "Prevention Hub": "",
-            "Risk Assessment": "",
-            "Medical Resources": "",
-            "FAQ": "",
-            "Contact": ""
-        }
-        
-        for item, icon in menu_items.items():
-            if st.button(f"{icon} {item}", key=f"menu_{item}"):
-                st.session_state.page = item
-            st.markdown("<style>div[data-testid='stButton'] > button {width: 100%;}</style>", unsafe_allow_html=True)
-        
-        st.markdown("</ul></div>", unsafe_allow_html=True)
-        
-        # Add user section
-        st.markdown("""
-        <div class="sidebar-section user-section">
-            <h3 class="sidebar-header">Your Health Profile</h3>
-            <div class="user-avatar">👤</div>
-            <p class="user-name">Welcome, User</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-
-# PAGE LAYOUTS
-
-
-def home_page():
-    col1, col2 = st.columns([1, 1])
-    
-    with col1:
-        st.markdown("""
-        <div class="hero-section">
-            <h1 class="hero-title">Revolutionizing Healthcare with AI</h1>
-            <p class="hero-subtitle">Your Personal Health Companion for Accurate, Instant Medical Insights</p>
-            <button class="primary-button">Get Started</button>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("""
-        <div class="feature-card">
-            <h3> Instant Analysis</h3>
-            <p>Upload medical images or reports and receive AI-powered insights in seconds.</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-    with col2:
-        st.image(r"C:\Users\MR COMPUTER\Desktop\My Projects\medical_detection_app\Screenshot 2025-04-28 224724.png", width = 300)
-    
-    st.markdown("""
-    <div class="features-section">
-        <h2 class="section-title">Why Choose MediScan AI?</h2>
-        <div class="features-grid">
-            <div class="feature-item">
-                <div class="feature-icon">⚡</div>
-                <h4>Lightning Fast</h4>
-                <p>Get results in minutes, not days</p>
-            </div>
-            <div class="feature-item">
-                <div class="feature-icon">🎯</div>
-                <h4>Highly Accurate</h4>
-                <p>Powered by advanced AI models</p>
-            </div>
-            <div class="feature-item">
-                <div class="feature-icon">🔒</div>
-                <h4>Secure & Private</h4>
-                <p>Your data stays confidential</p>
-            </div>
-            <div class="feature-item">
-                <div class="feature-icon">💡</div>
-                <h4>Actionable Insights</h4>
-                <p>Clear next steps for your health</p>
-            </div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-def diagnosis_page():
-    st.markdown("""
-    <div class="page-header">
-        <h1 class="page-title">AI-Powered Medical Diagnosis</h1>
-        <p class="page-subtitle">Upload your medical images or reports for instant analysis</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-    tab1, tab2, tab3 = st.tabs(["Image Analysis", "Report Analysis", "Symptom Checker"])
-
-    # --- Tab 1: Image Analysis ---
-    with tab1:
-        st.markdown("""
-        <div class="upload-card">
-            <h3>Upload Medical Image</h3>
-            <p>Supported formats: JPG, PNG, DICOM</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-        uploaded_file = st.file_uploader("Choose a medical image", type=["jpg", "jpeg", "png"], label_visibility="collapsed")
-
-        if uploaded_file:
-            col1, col2 = st.columns([1, 1])
-
-            with col1:
-                st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
-                image = Image.open(uploaded_file)
-
-            with col2:
-                if st.button("Analyze Image", type="primary"):
-                    with st.spinner("Analyzing image with AI..."):
-                        try:
-                            # Prepare the image for Gemini
-                            img_prompt = """
-                            You are a medical imaging specialist analyzing this image. Provide:
-                            1. A professional assessment of any visible abnormalities
-                            2. Potential conditions that could explain these findings
-                            3. Recommended next steps (imaging follow-up, specialist consultation)
-                            4. Urgency level (routine, moderate, urgent)
-                            
-                            Be factual but compassionate. Always remind this is not a diagnosis.
-                            """
-                            
-                            # Call Gemini with the image
-                            response = model.generate_content([img_prompt, image])
-                            
-                            # Display results
-                            st.success("Analysis complete!")
-                            st.markdown(f"""
-                            <div class="result-card">
-                                <h3>AI Analysis Results</h3>
-                                <div class="result-content">
-                                    {response.text}
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                        except Exception as e:
-                            st.error(f"Analysis failed: {str(e)}")
-                            st.info("Please try with a different image or consult a healthcare provider")
-
-    # --- Tab 2: Report Analysis ---
-    with tab2:
-        st.markdown("""
-        <div class="upload-card">
-            <h3>Upload Lab Report</h3>
-            <p>Supported formats: PDF, TXT, CSV</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-        report_file = st.file_uploader("Choose a report file", type=["pdf", "txt", "csv"], key="report_uploader", label_visibility="collapsed")
-
-        if report_file:
-            if st.button("Analyze Report", type="primary"):
-                with st.spinner("Processing report..."):
-                    try:
-                        # Read the report content
-                        if report_file.type == "application/pdf":
-                            # For PDFs we'd need additional libraries like PyPDF2
-                            report_text = "[PDF content extracted would appear here]"
-                        else:
-                            report_text = report_file.getvalue().decode("utf-8")
-                        
-                        # Prepare the report prompt
-                        report_prompt = f"""
-                        Analyze this medical report and provide:
-                        1. Summary of key abnormal findings
-                        2. Potential health implications
-                        3. Recommended follow-up actions
-                        4. General health advice
-                        
-                        Report content:
-                        {report_text[:3000]}... [truncated if long]
-                        """
-                        
-                        # Call Gemini with the report text
-                        response = model.generate_content(report_prompt)
-                        
-                        st.success("Report analysis complete!")
-                        st.markdown(f"""
-                        <div class="result-card">
-                            <h3>Report Analysis Summary</h3>
-                            <div class="result-content">
-                                {response.text}
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                    except Exception as e:
-                        st.error(f"Report analysis failed: {str(e)}")
-
-    # --- Tab 3: Symptom Checker ---
-    with tab3:
-        st.markdown("""
-        <div class="symptom-card">
-            <h3>Check Your Symptoms</h3>
-            <p>Select the symptoms you're experiencing below.</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-        symptoms = st.multiselect(
-            "Choose your symptoms:",
-            options=[
-                "Fever", "Cough", "Chest Pain", "Shortness of Breath", "Fatigue",
-                "Nausea", "Headache", "Abdominal Pain", "Joint Pain", "Skin Rash"
-            ],
-            label_visibility="collapsed"
-        )
-
-        duration = st.selectbox("Duration of symptoms", ["Less than 24 hours", "1-3 days", "3-7 days", "1-2 weeks", "More than 2 weeks"])
-        severity = st.select_slider("Symptom severity", ["Mild", "Moderate", "Severe"])
-
-        if st.button("Check Possible Conditions"):
-            if not symptoms:
-                st.warning("Please select at least one symptom.")
-            else:
-                with st.spinner("Analyzing symptoms..."):
-                    try:
-                        symptom_prompt = f"""
-                        A user reports these symptoms:
-                        - Main symptoms: {", ".join(symptoms)}
-                        - Duration: {duration}
-                        - Severity: {severity}
-                        
-                        Provide:
-                        1. 2-3 most likely general conditions (not diagnoses)
-                        2. Recommended self-care measures
-                        3. When to seek medical attention
-                        4. Red flag symptoms to watch for
-                        
-                        Be conservative and always recommend professional evaluation when uncertain.
-                        """
-                        
-                        response = model.generate_content(symptom_prompt)
-                        
-                        st.success("Preliminary Insight:")
-                        st.markdown(f"""
-                        <div class="result-card">
-                            <h3>Symptom Analysis</h3>
-                            <div class="result-content">
-                                {response.text}
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                    except Exception as e:
-                        st.error(f"Symptom analysis failed: {str(e)}")
-
-def health_insights_page():
-    if 'user_health_data' not in st.session_state:
-        st.session_state.user_health_data = pd.DataFrame(columns=['Date', 'Blood Pressure', 'Cholesterol', 'Heart Rate'])
-    st.title("Health Insights")
-    st.markdown("""
-    <div class="page-header">
-        <h1 class="page-title">Your Health Insights Dashboard</h1>
-        <p class="page-subtitle">Track and analyze your health metrics over time</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-    st.markdown("###  Enter Your Health Metrics")
-    
-    with st.form("health_input_form"):
-        bp = st.number_input("Blood Pressure (mm Hg)", min_value=80, max_value=200, value=120)
-        cholesterol = st.number_input("Cholesterol (mg/dL)", min_value=100, max_value=400, value=200)
-        heart_rate = st.number_input("Heart Rate (bpm)", min_value=40, max_value=180, value=75)
-        submit = st.form_submit_button("Add Entry")
-        
-        if submit:
-            new_data = pd.DataFrame([{
-                'Date': datetime.today().date(),
-                'Blood Pressure': bp,
-                'Cholesterol': cholesterol,
-                'Heart Rate': heart_rate
-            }])
-            st.session_state.user_health_data = pd.concat([st.session_state.user_health_data, new_data], ignore_index=True)
-            st.success("Health entry added!")
-
-    # Visualizations
-    if not st.session_state.user_health_data.empty:
-        data = st.session_state.user_health_data
-
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            st.markdown("### 📈 Your Health Trends")
-            tab1, tab2, tab3 = st.tabs(["Blood Pressure", "Cholesterol", "Heart Rate"])
-            
-            with tab1:
-                fig, ax = plt.subplots(figsize=(10, 4))
-                sns.lineplot(data=data, x='Date', y='Blood Pressure', marker='o', ax=ax)
-                ax.set_title("Blood Pressure Over Time")
-                st.pyplot(fig)
-                
-            with tab2:
-                fig, ax = plt.subplots(figsize=(10, 4))
-                sns.lineplot(data=data, x='Date', y='Cholesterol', marker='o', color='orange', ax=ax)
-                ax.set_title("Cholesterol Over Time")
-                st.pyplot(fig)
-                
-            with tab3:
-                fig, ax = plt.subplots(figsize=(10, 4))
-                sns.lineplot(data=data, x='Date', y='Heart Rate', marker='o', color='green', ax=ax)
-                ax.set_title("Heart Rate Over Time")
-                st.pyplot(fig)
-        
-        with col2:
-            st.markdown("### 💡 AI Health Summary")
-            latest = data.iloc[-1]
-            if latest['Blood Pressure'] < 130:
-                st.success("✅ Blood Pressure is in a healthy range.")
-            else:
-                st.warning("⚠️ Monitor your blood pressure.")
-
-            if latest['Cholesterol'] > 200:
-                st.warning("⚠️ Cholesterol is above the recommended level.")
-            else:
-                st.success("✅ Cholesterol is in a healthy range.")
-
-            if 60 <= latest['Heart Rate'] <= 100:
-                st.success("✅ Heart rate is normal.")
-            else:
-                st.warning("⚠️ Abnormal heart rate detected.")
-    else:
-        st.info("No data to display yet. Please enter your health metrics above.")
-
-def disease_insights():
-    st.title(" Disease Insights")
-    disease = st.selectbox("Select a condition to learn more:", ["Diabetes", "Hypertension", "Asthma", "Heart Disease", "COVID-19"])
-    
-    disease_info = {
-        "Diabetes": "A chronic condition affecting how your body turns food into energy. Management involves lifestyle changes and possibly medication.",
-        "Hypertension": "High blood pressure often has no symptoms but can lead to serious health issues. Regular monitoring and healthy living are key.",
-        "Asthma": "A respiratory condition marked by spasms in the bronchi of the lungs, causing difficulty in breathing.",
-        "Heart Disease": "Includes conditions like coronary artery disease, heart attacks, and arrhythmias. It’s the leading cause of death globally.",
-        "COVID-19": "A viral respiratory illness caused by SARS-CoV-2. Preventive measures and vaccination reduce risk of severe outcomes."
-    }
-
-    st.info(disease_info[disease])
-
-def prevention_hub():
-    st.title(" Prevention Hub")
-    st.markdown("""
-    ### General Preventive Tips
-    -  Eat a balanced, nutrient-rich diet
-    -  Exercise at least 30 minutes a day
-    -  Avoid tobacco and limit alcohol
-    -  Sleep 7-9 hours each night
-    -  Wash hands regularly and practice hygiene
-    -  Stay up to date with vaccinations
-    -  Manage stress through mindfulness or meditation
-    """)
-
-def risk_assessment():
-    st.title(" Health Risk Assessment")
-
-    age = st.slider("Your Age", 10, 90, 30)
-    bmi = st.number_input("Your BMI", min_value=10.0, max_value=50.0)
-    smoker = st.radio("Do you smoke?", ["No", "Yes"])
-    activity = st.selectbox("Physical Activity Level", ["Low", "Moderate", "High"])
-    
-    risk_score = 0
-    risk_score += 1 if age > 50 else 0
-    risk_score += 1 if bmi >= 30 else 0
-    risk_score += 1 if smoker == "Yes" else 0
-    risk_score += 1 if activity == "Low" else 0
-
-    if st.button("Assess Risk"):
-        if risk_score <= 1:
-            st.success("✅ Your health risk is Low. Keep up the healthy habits!")
-        elif risk_score == 2:
-            st.warning("⚠️ Moderate risk. Consider lifestyle improvements.")
-        else:
-            st.error("❗High risk. Please consult a healthcare provider.")
-
-def medical_resources():
-    st.title(" Medical Resources")
-
-    st.markdown("""
-    ### Trusted Health Websites
-    - [World Health Organization (WHO)](https://www.who.int/)
-    - [Centers for Disease Control and Prevention (CDC)](https://www.cdc.gov/)
-    - [Mayo Clinic](https://www.mayoclinic.org/)
-    - [WebMD](https://www.webmd.com/)
-    - [National Institutes of Health (NIH)](https://www.nih.gov/)
-    
-    ### Medical Hotline Numbers (Country-Specific)
-    - Emergency: 112 / 911
-    - COVID-19 Helpline: [Local Ministry of Health site]
-    """)
-
-def faq_section():
-    st.title(" Frequently Asked Questions")
-
-    with st.expander("Is this app a substitute for a doctor?"):
-        st.info("No. This app provides general health insights and does not replace professional medical advice.")
-
-    with st.expander("Is my data stored?"):
-        st.info("No. All data is processed in-session and not stored permanently.")
-
-    with st.expander("Can I get a prescription?"):
-        st.warning("No. Only a licensed physician can issue medical prescriptions.")
-
-    with st.expander("Which files can I upload?"):
-        st.info("Supported files include JPG, PNG, DICOM for images and PDF, TXT, CSV for reports.")
-
-def contact_page():
-    st.title(" Contact & Feedback")
-
-    st.markdown("""
-    We'd love to hear from you. For support, questions, or suggestions:
-    
-    -  **Email**: abdullbasit0023@gmail.com
-    -  **Website**: [www.aimedicalassist.com](#)
-    -  **Feedback Form**: [Fill here](#)
-    -  **Support Hours**: Mon-Fri, 9AM - 5PM (Local Time)
-    """)
-
-
-
-# MAIN APP LOGIC
-
-
-def main():
-    sidebar()
-    
-    if st.session_state.page == "Home":
-        home_page()
-    elif st.session_state.page == "AI Diagnosis":
-        diagnosis_page()
-    elif st.session_state.page == "Health Insights":
-        health_insights_page()
-    elif st.session_state.page == "FAQ":
-        faq_section()
-    elif st.session_state.page == "Contact":
-        contact_page()
-    elif st.session_state.page == "Medical Resources":
-        medical_resources()
-    elif st.session_state.page == "Risk Assessment":
-        risk_assessment()
-    elif st.session_state.page == "Prevention Hub":
-        prevention_hub()
-    elif st.session_state.page == "Disease Encyclopedia":
-        disease_insights()
-    
-
-if __name__ == "__main__":
-    main()
+import streamlit as st
+from pathlib import Path
+import base64
+import functools
+import re
+import uuid
+import config
+import diagnosis_core
+import metrics
+import session_memory
+
+# pandas, seaborn, matplotlib, PIL and the report/image pipelines are imported
+# inside the pages that use them, so static pages never pay for loading them.
+
+
+# SETUP & CONFIGURATION
+
+
+# Page config
+st.set_page_config(
+    page_title="MediScan AI - Advanced Medical Diagnosis",
+    layout="wide",
+    page_icon="🩺",
+    initial_sidebar_state="expanded"
+)
+
+# Static assets are read from disk once per server process, not on every rerun
+@st.cache_resource
+def read_asset(path, mode="r"):
+    try:
+        with open(path, mode) as f:
+            return f.read()
+    except OSError:
+        return None
+
+# Custom CSS
+def local_css(file_name):
+    css = read_asset(file_name)
+    if css is not None:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+
+local_css(config.STYLE_PATH)
+
+
+# SESSION STATE & NAVIGATION
+
+
+if "page" not in st.session_state:
+    st.session_state.page = "Home"
+
+
+# FRAGMENTS
+# Independent regions of a page are fragments: a widget inside one reruns only that function, not the
+# stylesheet, the sidebar and the rest of the page. Render times are recorded as fragment_render_seconds
+# (python benchmarks/reruns.py compares them with full reruns).
+
+def fragment(name, **kwargs):
+    def decorate(func):
+        timed = metrics.span("fragment_render", fragment=name)(func)
+
+        def run(*args, **kw):
+            try:
+                return timed(*args, **kw)
+            finally:
+                # A fragment rerun skips main(), so it applies the session memory budgets itself
+                from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+                ctx = get_script_run_ctx()
+                if ctx is not None and ctx.fragment_ids_this_run:
+                    session_memory.get_default_registry().enforce()
+
+        return st.fragment(functools.wraps(func)(run), **kwargs)
+    return decorate
+
+
+# PAGE COMPONENTS
+
+
+def result_card(title, text):
+    return f"""
+    <div class="result-card">
+        <h3>{title}</h3>
+        <div class="result-content">
+            {text}
+        </div>
+    </div>
+    """
+
+def show_timing(result):
+    if result["cached"]:
+        st.caption("Served from cache")
+    else:
+        st.caption(f"First output after {result['first_chunk_seconds']:.2f}s · completed in {result['total_seconds']:.2f}s")
+
+def show_details(details):
+    if "width" in details:
+        st.caption(
+            f"Sent {details['width']}x{details['height']} image · "
+            f"{details['upload_bytes'] / 1024:.0f} KB → {details['encoded_bytes'] / 1024:.0f} KB "
+            f"in {details['encode_seconds'] * 1000:.0f} ms"
+        )
+    if "dicom_frames" in details:
+        window = details["dicom_window"]
+        st.caption(
+            f"DICOM {details['dicom_size']} · {len(details['dicom_frames_used'])} of {details['dicom_frames']} frame(s) sent"
+            + (f" · window {window[0]:g}/{window[1]:g}" if window else "")
+            + f" · decoded in {details['dicom_decode_seconds'] * 1000:.0f} ms"
+            f" using {details['dicom_peak_working_bytes'] / 1024 ** 2:.1f} MB"
+        )
+    if "prompt_tokens" in details:
+        st.caption(f"Prompt: about {details['prompt_tokens']} tokens, system instruction included")
+    if "total_rows" in details:
+        unscreened = details.get("unscreened_rows")
+        st.caption(
+            f"{details['abnormal_rows']} of {details['total_rows']} results out of range"
+            + (f" · {unscreened} could not be screened and were sent as reported" if unscreened else "")
+        )
+    if "pages" in details:
+        st.caption(
+            f"{details['pages']} page(s) in {details['chunks']} chunk(s) · "
+            + " · ".join(f"{stage} {seconds:.2f}s" for stage, seconds in details["timings"].items())
+        )
+
+
+# BACKGROUND JOBS
+# Analyses run on the job queue's worker threads; a page only keeps the job ID in session state, so
+# reruns, other widgets and navigation never interrupt or repeat the work.
+
+def track_memory(name, obj, evict=None):
+    # Account obj against this session's memory budget (see session_memory.py)
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        session_memory.get_default_registry().track(ctx.session_id, name, obj, evict)
+
+def session_slot(name):
+    # A dict in session state that counts against the memory budget. Under pressure it is released
+    # (job IDs and chats are forgotten, the work itself is kept by the job queue and result cache)
+    # and starts empty again.
+    slot = st.session_state.get(name)
+    if slot is None or slot.value is None:
+        slot = st.session_state[name] = session_memory.Slot({})
+    track_memory(name, slot, evict=session_memory.Slot.release)
+    return slot.value
+
+def drop_uploads(ctx, file_ids):
+    remove = getattr(ctx.uploaded_file_mgr, "remove_file", None)
+    if remove is not None:
+        for file_id in file_ids:
+            remove(ctx.session_id, file_id)
+
+def file_uploader(label, key, **kwargs):
+    # Streamlit keeps uploads in memory for the whole session, so they count against its budget.
+    # Releasing them removes the files from Streamlit's (thread-safe) upload manager at once; the
+    # widget is reset on the session's next run.
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    held = st.session_state.get(f"{key}_held")
+    version = st.session_state.get(f"{key}_version", 0)
+    if held is not None and held.released:
+        version = st.session_state[f"{key}_version"] = version + 1
+        st.info("Your earlier upload was released to free server memory. Please upload it again if you still need it.")
+    files = st.file_uploader(label, key=f"{key}_{version}", **kwargs)
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        listed = files if isinstance(files, list) else [files] if files else []
+        held = st.session_state[f"{key}_held"] = session_memory.Slot(
+            [f.file_id for f in listed], size=sum(f.size for f in listed),
+            on_release=functools.partial(drop_uploads, ctx),
+        )
+        track_memory(f"upload:{key}", held, evict=session_memory.Slot.release)
+    return files
+
+def submit_analysis(job_key, kind, params=None, payload=None):
+    import job_queue
+
+    jobs = job_queue.get_default_queue()
+    job_id = session_slot("jobs")[job_key] = jobs.submit(kind, params, payload)
+    # Cached results finish almost at once; show them without waiting for a poll
+    jobs.wait(job_id, 0.3)
+
+def show_job(job_key, title, success_message, failure_hint=None):
+    import job_queue
+
+    job_ids = session_slot("jobs")
+    job_id = job_ids.get(job_key)
+    if job_id is None:
+        return
+    job = job_queue.get_default_queue().get(job_id)
+    if job is None:
+        # Purged from the queue; the user can simply submit again
+        del job_ids[job_key]
+        return
+    if job["status"] in (job_queue.QUEUED, job_queue.RUNNING):
+        poll_job(job_key, title)
+    elif job["status"] == job_queue.FAILED:
+        st.error(f"Analysis failed: {job['error']}")
+        if failure_hint:
+            st.info(failure_hint)
+    else:
+        st.markdown(result_card(title, job["result"]["text"]), unsafe_allow_html=True)
+        show_timing(job["result"])
+        show_details(job["result"]["details"])
+        st.success(success_message)
+        follow_up_chat(job_key, job)
+
+@fragment("job_poll", run_every=config.JOB_POLL_SECONDS)
+def poll_job(job_key, title):
+    # Only this fragment reruns while the job is in progress
+    import job_queue
+
+    job_id = session_slot("jobs").get(job_key)
+    job = job_queue.get_default_queue().get(job_id) if job_id is not None else None
+    if job is None or job["status"] in (job_queue.DONE, job_queue.FAILED):
+        st.rerun()
+    st.info("Analysis in progress. You can keep using the app; the result will appear here.")
+    if job["partial"]:
+        st.markdown(result_card(title, job["partial"]), unsafe_allow_html=True)
+
+
+@fragment("follow_up_chat")
+def follow_up_chat(job_key, job):
+    # Follow-ups continue from the result text, so the image or report is not sent again
+    chat_key = f"{job_key}_chat"
+    chats = session_slot("chats")
+    chat = chats.get(chat_key)
+    if chat is None or chat["job"] != job["id"]:
+        chat = chats[chat_key] = {
+            "job": job["id"],
+            "history": diagnosis_core.start_conversation(job["kind"], job["result"]["text"]),
+        }
+    for turn in chat["history"][2:]:
+        with st.chat_message("user" if turn["role"] == "user" else "assistant"):
+            st.markdown(turn["parts"][0])
+
+    with st.form(f"{chat_key}_form", clear_on_submit=True):
+        question = st.text_input("Ask a follow-up question about this result")
+        asked = st.form_submit_button("Ask")
+    if asked and question.strip():
+        with st.chat_message("user"):
+            st.markdown(question)
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            try:
+                result = diagnosis_core.follow_up(chat["history"], question, on_text=placeholder.markdown)
+            except Exception as e:
+                placeholder.error(f"Could not answer: {str(e)}")
+            else:
+                placeholder.markdown(result.text)
+                st.caption(f"{result.details['prompt_tokens']} prompt tokens (estimated)")
+
+
+def go_to(page):
+    st.session_state.page = page
+
+def sidebar():
+    with st.sidebar:
+        logo = read_asset(config.LOGO_PATH, "rb")
+        if logo is not None:
+            st.image(logo, use_container_width=True)
+        
+        st.markdown("""
+        <div class="sidebar-section">
+            <h3 class="sidebar-header">Navigation</h3>
+            <ul class="sidebar-menu">
+        """, unsafe_allow_html=True)
+        
+        menu_items = {
+            "Home": "",
+            "AI Diagnosis": "",
+            "Health Insights": "",
+            "Disease Encyclopedia": "",
+            "Prevention Hub": "",
+            "Risk Assessment": "",
+            "Medical Resources": "",
+            "FAQ": "",
+            "Contact": ""
+        }
+        if config.ADMIN_PANEL:
+            menu_items["Admin"] = ""
+        
+        # Navigation changes the page, so it needs a full rerun and the sidebar is not a fragment.
+        # The callback switches pages before the script starts, so the rerun renders the new page once.
+        for item, icon in menu_items.items():
+            st.button(f"{icon} {item}", key=f"menu_{item}", on_click=go_to, args=(item,), width="stretch")
+        
+        st.markdown("</ul></div>", unsafe_allow_html=True)
+        
+        # Add user section
+        st.markdown("""
+        <div class="sidebar-section user-section">
+            <h3 class="sidebar-header">Your Health Profile</h3>
+            <div class="user-avatar">👤</div>
+            <p class="user-name">Welcome, User</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+# PAGE LAYOUTS
+
+
+def home_page():
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        st.markdown("""
+        <div class="hero-section">
+            <h1 class="hero-title">Revolutionizing Healthcare with AI</h1>
+            <p class="hero-subtitle">Your Personal Health Companion for Accurate, Instant Medical Insights</p>
+            <button class="primary-button">Get Started</button>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("""
+        <div class="feature-card">
+            <h3> Instant Analysis</h3>
+            <p>Upload medical images or reports and receive AI-powered insights in seconds.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+    with col2:
+        logo = read_asset(config.LOGO_PATH, "rb")
+        if logo is not None:
+            st.image(logo, width = 300)
+    
+    st.markdown("""
+    <div class="features-section">
+        <h2 class="section-title">Why Choose MediScan AI?</h2>
+        <div class="features-grid">
+            <div class="feature-item">
+                <div class="feature-icon">⚡</div>
+                <h4>Lightning Fast</h4>
+                <p>Get results in minutes, not days</p>
+            </div>
+            <div class="feature-item">
+                <div class="feature-icon">🎯</div>
+                <h4>Highly Accurate</h4>
+                <p>Powered by advanced AI models</p>
+            </div>
+            <div class="feature-item">
+                <div class="feature-icon">🔒</div>
+                <h4>Secure & Private</h4>
+                <p>Your data stays confidential</p>
+            </div>
+            <div class="feature-item">
+                <div class="feature-icon">💡</div>
+                <h4>Actionable Insights</h4>
+                <p>Clear next steps for your health</p>
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+IMAGE_TYPES = ["jpg", "jpeg", "png", "dcm"]
+
+def spooled_upload(uploaded_file):
+    # DICOM studies can be very large: they are written to disk once per upload and handled by path
+    # (memory-mapped when rendered) rather than copied as bytes into previews, jobs and the model client
+    import image_pipeline
+
+    spooled = session_slot("jobs")
+    key = f"spooled_{uploaded_file.file_id}"
+    path = spooled.get(key)
+    if path is None or not Path(path).is_file():
+        path = spooled[key] = str(image_pipeline.spool_upload(uploaded_file, ".dcm"))
+    return path
+
+# DICOM thumbnails are keyed by the spooled file (named by content hash), so the study is not
+# re-decoded on every rerun
+@st.cache_data(max_entries=4, show_spinner=False)
+def dicom_preview(path):
+    import dicom_pipeline
+
+    study = dicom_pipeline.render(path, max_side=512)
+    return study.image, study.frames
+
+def batch_image_analysis():
+    # Every image is a background job like a single analysis; the page keeps the job IDs and polls them,
+    # so reruns and navigation neither block on nor restart the batch
+    import job_queue
+
+    uploaded_files = file_uploader(
+        "Choose medical images", "batch_uploader", type=IMAGE_TYPES, accept_multiple_files=True,
+        label_visibility="collapsed"
+    )
+    if not uploaded_files:
+        return
+
+    batch_key = "batch_jobs_" + "_".join(f.file_id for f in uploaded_files)
+    if st.button(f"Analyze {len(uploaded_files)} Images", type="primary"):
+        jobs = job_queue.get_default_queue()
+        batch = []
+        for f in uploaded_files:
+            # Batch jobs run on their own workers and share the MEDISCAN_BATCH_REQUESTS_PER_MINUTE rate limit
+            if f.name.lower().endswith(".dcm"):
+                params, payload = {"path": spooled_upload(f)}, None
+            else:
+                params, payload = {}, f.getvalue()
+            batch.append((f.name, jobs.submit("batch_image", params, payload)))
+        session_slot("jobs")[batch_key] = batch
+    show_batch(batch_key)
+
+def batch_jobs(batch_key):
+    import job_queue
+
+    jobs = job_queue.get_default_queue()
+    return [(name, jobs.get(job_id)) for name, job_id in session_slot("jobs").get(batch_key, [])]
+
+def batch_pending(jobs):
+    import job_queue
+
+    return sum(job is not None and job["status"] in (job_queue.QUEUED, job_queue.RUNNING) for _, job in jobs)
+
+def batch_results(jobs):
+    import job_queue
+
+    for name, job in jobs:
+        if job is None:
+            st.caption(f"{name}: no longer available, please analyze it again")
+        elif job["status"] == job_queue.DONE:
+            result = job["result"]
+            label = "cached" if result["cached"] else f"{result['total_seconds']:.1f}s"
+            with st.expander(f"✅ {name} ({label})"):
+                st.markdown(result_card("AI Analysis Results", result["text"]), unsafe_allow_html=True)
+        elif job["status"] == job_queue.FAILED:
+            with st.expander(f"❌ {name}"):
+                st.error(f"Analysis failed: {job['error']}")
+
+def show_batch(batch_key):
+    import job_queue
+
+    jobs = batch_jobs(batch_key)
+    if not jobs:
+        return
+    if batch_pending(jobs):
+        poll_batch(batch_key)
+        return
+    batch_results(jobs)
+    failures = sum(job is None or job["status"] != job_queue.DONE for _, job in jobs)
+    if failures:
+        st.warning(f"{failures} of {len(jobs)} images could not be analyzed.")
+    else:
+        st.success("Batch analysis complete!")
+
+@fragment("batch_poll", run_every=config.JOB_POLL_SECONDS)
+def poll_batch(batch_key):
+    # Only this fragment reruns while images are being analyzed
+    jobs = batch_jobs(batch_key)
+    pending = batch_pending(jobs)
+    if not pending:
+        st.rerun()
+    done = len(jobs) - pending
+    st.progress(done / len(jobs), text=f"Analyzed {done} of {len(jobs)} images")
+    batch_results(jobs)
+
+def diagnosis_page():
+    st.markdown("""
+    <div class="page-header">
+        <h1 class="page-title">AI-Powered Medical Diagnosis</h1>
+        <p class="page-subtitle">Upload your medical images or reports for instant analysis</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    tab1, tab2, tab3 = st.tabs(["Image Analysis", "Report Analysis", "Symptom Checker"])
+
+    # Each tab is a fragment, so working in one tab does not rerun the others
+    with tab1:
+        image_analysis()
+    with tab2:
+        report_analysis()
+    with tab3:
+        symptom_checker()
+
+@fragment("image_analysis")
+def image_analysis():
+    st.markdown("""
+    <div class="upload-card">
+        <h3>Upload Medical Image</h3>
+        <p>Supported formats: JPG, PNG, DICOM</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    batch_mode = st.toggle("Batch mode (analyze several images of one case)")
+
+    if batch_mode:
+        batch_image_analysis()
+        uploaded_file = None
+    else:
+        uploaded_file = file_uploader("Choose a medical image", "image_uploader", type=IMAGE_TYPES, label_visibility="collapsed")
+
+    if uploaded_file:
+        col1, col2 = st.columns([1, 1])
+        params = {}
+
+        with col1:
+            if uploaded_file.name.lower().endswith(".dcm"):
+                params["path"] = spooled_upload(uploaded_file)
+                try:
+                    preview, frames = dicom_preview(params["path"])
+                except (RuntimeError, ValueError) as e:
+                    st.error(str(e))
+                else:
+                    st.image(preview, caption=f"DICOM study · {frames} frame(s)", use_container_width=True)
+                    if frames > 1 and st.radio(
+                        "Frames to analyze", [f"Mosaic of up to {config.DICOM_MOSAIC_FRAMES} frames", "Single frame"],
+                        horizontal=True
+                    ) == "Single frame":
+                        params["frame"] = st.slider("Frame", 0, frames - 1, frames // 2)
+            else:
+                st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
+
+        with col2:
+            job_key = f"image_job_{uploaded_file.file_id}_{params.get('frame')}"
+            if st.button("Analyze Image", type="primary"):
+                submit_analysis(job_key, "image", params, None if "path" in params else uploaded_file.getvalue())
+            show_job(
+                job_key, "AI Analysis Results", "Analysis complete!",
+                "Please try with a different image or consult a healthcare provider"
+            )
+
+@fragment("report_analysis")
+def report_analysis():
+    st.markdown("""
+    <div class="upload-card">
+        <h3>Upload Lab Report</h3>
+        <p>Supported formats: PDF, TXT, CSV</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    report_file = file_uploader("Choose a report file", "report_uploader", type=["pdf", "txt", "csv"], label_visibility="collapsed")
+
+    if report_file:
+        job_key = f"report_job_{report_file.file_id}"
+        if st.button("Analyze Report", type="primary"):
+            submit_analysis(
+                job_key, "report",
+                {"filename": report_file.name, "content_type": report_file.type},
+                report_file.getvalue()
+            )
+        show_job(job_key, "Report Analysis Summary", "Report analysis complete!")
+
+@fragment("symptom_checker")
+def symptom_checker():
+    st.markdown("""
+    <div class="symptom-card">
+        <h3>Check Your Symptoms</h3>
+        <p>Select the symptoms you're experiencing below.</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    symptoms = st.multiselect(
+        "Choose your symptoms:",
+        options=diagnosis_core.SYMPTOM_OPTIONS,
+        label_visibility="collapsed"
+    )
+
+    duration = st.selectbox("Duration of symptoms", diagnosis_core.DURATION_OPTIONS)
+    severity = st.select_slider("Symptom severity", diagnosis_core.SEVERITY_OPTIONS)
+
+    job_key = f"symptom_job_{sorted(symptoms)}_{duration}_{severity}"
+    if st.button("Check Possible Conditions"):
+        if not symptoms:
+            st.warning("Please select at least one symptom.")
+        else:
+            submit_analysis(job_key, "symptoms", {"symptoms": symptoms, "duration": duration, "severity": severity})
+    show_job(job_key, "Symptom Analysis", "Preliminary Insight:")
+
+PROFILE_TOKEN = re.compile(r"[0-9a-f]{32}")
+
+def health_profile_id():
+    # There are no accounts: readings are keyed by a random profile token kept in the page URL
+    # (?profile=...), so reopening or bookmarking the link brings them back. A visitor without one
+    # starts a new, empty profile and never sees anyone else's readings.
+    if 'user_id' not in st.session_state:
+        token = st.query_params.get("profile", "")
+        st.session_state.user_id = token if PROFILE_TOKEN.fullmatch(token) else uuid.uuid4().hex
+    if st.query_params.get("profile") != st.session_state.user_id:
+        st.query_params["profile"] = st.session_state.user_id
+    return st.session_state.user_id
+
+def health_insights_page():
+    import health_store
+
+    if 'health_store' not in st.session_state:
+        st.session_state.health_store = health_store.HealthStore(
+            health_profile_id(), window_days=health_store.WINDOWS["Last year"]
+        )
+    else:
+        health_profile_id()
+    store = st.session_state.health_store
+    st.title("Health Insights")
+    st.markdown("""
+    <div class="page-header">
+        <h1 class="page-title">Your Health Insights Dashboard</h1>
+        <p class="page-subtitle">Track and analyze your health metrics over time</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    health_dashboard(store)
+
+# Health Insights series: (chart title, line color)
+CHART_SERIES = {
+    "Blood Pressure": ("Blood Pressure Over Time", None),
+    "Cholesterol": ("Cholesterol Over Time", "orange"),
+    "Heart Rate": ("Heart Rate Over Time", "green"),
+}
+
+@fragment("health_dashboard")
+def health_dashboard(store):
+    # Adding an entry, changing the window or switching chart tabs reruns only this fragment
+    import charts
+    import health_store
+
+    # The window may have been released under memory pressure; it is reloaded from SQLite
+    if not store.loaded:
+        store.load_window(store.window_days)
+    track_memory("health_store", store, evict=lambda s: s.release())
+
+    st.markdown("###  Enter Your Health Metrics")
+    
+    with st.form("health_input_form"):
+        bp = st.number_input("Blood Pressure (mm Hg)", min_value=80, max_value=200, value=120)
+        cholesterol = st.number_input("Cholesterol (mg/dL)", min_value=100, max_value=400, value=200)
+        heart_rate = st.number_input("Heart Rate (bpm)", min_value=40, max_value=180, value=75)
+        submit = st.form_submit_button("Add Entry")
+        
+        if submit:
+            store.append(bp, cholesterol, heart_rate)
+            st.success("Health entry added!")
+
+    # Only the selected window is loaded from disk
+    window = st.selectbox("Show readings from", list(health_store.WINDOWS), index=2)
+    if health_store.WINDOWS[window] != store.window_days:
+        store.load_window(health_store.WINDOWS[window])
+
+    # Visualizations
+    data = store.to_frame()
+    # Statistics are kept up to date by the store on every append, never recomputed here
+    trends = store.analytics.summary()
+    if len(data) and all(trends.values()):
+
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.markdown("### 📈 Your Health Trends")
+            # Tabs track which one is open, so only the visible chart is rendered. Charts are
+            # downsampled, rendered once per distinct data and served from cache.
+            tabs = st.tabs(list(CHART_SERIES), on_change="rerun", key="health_chart_tab")
+            for tab, (name, (title, color)) in zip(tabs, CHART_SERIES.items()):
+                if tab.open is not False:
+                    with tab:
+                        st.image(charts.line_chart_png(data['Date'], data[name], title, color=color))
+        
+        with col2:
+            st.markdown("### 💡 AI Health Summary")
+            # The guidance below is about the latest reading; the smoothed level, trend and
+            # z-score are context only
+            latest = {name: stats["last"] for name, stats in trends.items()}
+            for name, stats in trends.items():
+                st.metric(
+                    name, f"{stats['last']:.0f}", f"{stats['recent_slope'] * 7:+.1f} / week",
+                    delta_color="off", help=f"Latest reading; the change is the {config.HEALTH_ROLLING_DAYS:g}-day trend"
+                )
+                z = f" · z = {stats['last_z']:+.1f}" if stats["last_z"] is not None else ""
+                st.caption(
+                    f"Smoothed {stats['ewma']:.0f}{z} · last {config.HEALTH_ROLLING_DAYS:g} days: {stats['recent_mean']:.0f}"
+                    f" ± {stats['recent_std']:.0f} over {stats['recent_count']} reading(s)"
+                    f" · {stats['anomalies']} of {stats['count']} shown were unusual"
+                )
+                if stats["last_anomaly"]:
+                    st.warning(f"⚠️ Your latest {name.lower()} reading is unusual for you (z = {stats['last_z']:+.1f}).")
+
+            if latest['Blood Pressure'] < 130:
+                st.success("✅ Blood Pressure is in a healthy range.")
+            else:
+                st.warning("⚠️ Monitor your blood pressure.")
+
+            if latest['Cholesterol'] > 200:
+                st.warning("⚠️ Cholesterol is above the recommended level.")
+            else:
+                st.success("✅ Cholesterol is in a healthy range.")
+
+            if 60 <= latest['Heart Rate'] <= 100:
+                st.success("✅ Heart rate is normal.")
+            else:
+                st.warning("⚠️ Abnormal heart rate detected.")
+    else:
+        st.info("No data to display yet. Please enter your health metrics above.")
+
+def disease_insights():
+    st.title(" Disease Insights")
+    disease = st.selectbox("Select a condition to learn more:", ["Diabetes", "Hypertension", "Asthma", "Heart Disease", "COVID-19"])
+    
+    disease_info = {
+        "Diabetes": "A chronic condition affecting how your body turns food into energy. Management involves lifestyle changes and possibly medication.",
+        "Hypertension": "High blood pressure often has no symptoms but can lead to serious health issues. Regular monitoring and healthy living are key.",
+        "Asthma": "A respiratory condition marked by spasms in the bronchi of the lungs, causing difficulty in breathing.",
+        "Heart Disease": "Includes conditions like coronary artery disease, heart attacks, and arrhythmias. It’s the leading cause of death globally.",
+        "COVID-19": "A viral respiratory illness caused by SARS-CoV-2. Preventive measures and vaccination reduce risk of severe outcomes."
+    }
+
+    st.info(disease_info[disease])
+
+def prevention_hub():
+    st.title(" Prevention Hub")
+    st.markdown("""
+    ### General Preventive Tips
+    -  Eat a balanced, nutrient-rich diet
+    -  Exercise at least 30 minutes a day
+    -  Avoid tobacco and limit alcohol
+    -  Sleep 7-9 hours each night
+    -  Wash hands regularly and practice hygiene
+    -  Stay up to date with vaccinations
+    -  Manage stress through mindfulness or meditation
+    """)
+
+def risk_assessment():
+    st.title(" Health Risk Assessment")
+    risk_form()
+
+@fragment("risk_form")
+def risk_form():
+    age = st.slider("Your Age", 10, 90, 30)
+    bmi = st.number_input("Your BMI", min_value=10.0, max_value=50.0)
+    smoker = st.radio("Do you smoke?", ["No", "Yes"])
+    activity = st.selectbox("Physical Activity Level", ["Low", "Moderate", "High"])
+    
+    if st.button("Assess Risk"):
+        # Same engine that scores whole rosters (python risk_engine.py roster.csv)
+        import risk_engine
+
+        risk_score, risk_level = risk_engine.score_one(age, bmi, smoker, activity)
+        if risk_level == "Low":
+            st.success("✅ Your health risk is Low. Keep up the healthy habits!")
+        elif risk_level == "Moderate":
+            st.warning("⚠️ Moderate risk. Consider lifestyle improvements.")
+        else:
+            st.error("❗High risk. Please consult a healthcare provider.")
+
+def medical_resources():
+    st.title(" Medical Resources")
+
+    st.markdown("""
+    ### Trusted Health Websites
+    - [World Health Organization (WHO)](https://www.who.int/)
+    - [Centers for Disease Control and Prevention (CDC)](https://www.cdc.gov/)
+    - [Mayo Clinic](https://www.mayoclinic.org/)
+    - [WebMD](https://www.webmd.com/)
+    - [National Institutes of Health (NIH)](https://www.nih.gov/)
+    
+    ### Medical Hotline Numbers (Country-Specific)
+    - Emergency: 112 / 911
+    - COVID-19 Helpline: [Local Ministry of Health site]
+    """)
+
+def faq_section():
+    st.title(" Frequently Asked Questions")
+
+    with st.expander("Is this app a substitute for a doctor?"):
+        st.info("No. This app provides general health insights and does not replace professional medical advice.")
+
+    with st.expander("Is my data stored?"):
+        st.info("Uploaded files are not stored permanently. Health metrics you enter are saved on the server under a private profile link: the Health Insights page address includes a random profile token, so bookmark it to see your trends on later visits. Anyone with that link can see those readings, so do not share it. AI results are cached there to answer repeated requests faster.")
+
+    with st.expander("Can I get a prescription?"):
+        st.warning("No. Only a licensed physician can issue medical prescriptions.")
+
+    with st.expander("Which files can I upload?"):
+        st.info("Supported files include JPG, PNG, DICOM for images and PDF, TXT, CSV for reports.")
+
+def contact_page():
+    st.title(" Contact & Feedback")
+
+    st.markdown("""
+    We'd love to hear from you. For support, questions, or suggestions:
+    
+    -  **Email**: abdullbasit0023@gmail.com
+    -  **Website**: [www.aimedicalassist.com](#)
+    -  **Feedback Form**: [Fill here](#)
+    -  **Support Hours**: Mon-Fri, 9AM - 5PM (Local Time)
+    """)
+
+
+
+def admin_page():
+    # Live view of this server process's metrics registry (enabled with MEDISCAN_ADMIN_PANEL=1)
+    import charts
+    import response_cache
+
+    st.markdown("<h1 style='text-align: center;'>Admin · Metrics</h1>", unsafe_allow_html=True)
+    data = metrics.snapshot()
+
+    st.subheader("Timings")
+    st.dataframe([
+        {"name": t["name"], "labels": t["labels"], "count": t["count"], "p50": t["p50"], "p95": t["p95"], "p99": t["p99"], "max": t["max"]}
+        for t in sorted(data["timings"], key=lambda t: t["name"])
+    ])
+
+    st.subheader("Counters")
+    st.dataframe(sorted(data["counters"], key=lambda c: c["name"]))
+    if data["gauges"]:
+        st.subheader("Gauges")
+        st.dataframe(data["gauges"])
+
+    st.subheader("Response cache")
+    cache = response_cache.get_default_cache()
+    st.json(cache.stats())
+    worker_stats = getattr(cache.store, "worker_stats", None)
+    if worker_stats is not None:
+        st.caption("Hit rate of every worker process sharing this cache")
+        st.dataframe(worker_stats())
+
+    st.subheader("Chart cache")
+    st.caption("Rendered Health Insights charts, shared by every session of this process")
+    st.json(charts.cache_stats())
+    st.download_button("Download Prometheus metrics", metrics.to_prometheus(), file_name="mediscan.prom")
+
+    st.subheader("Session memory")
+    registry = session_memory.get_default_registry()
+    st.caption(
+        f"Budgets: {registry.session_budget / 2**20:.0f} MB per session, {registry.total_budget / 2**20:.0f} MB in total"
+        f" · {registry.evictions} evictions"
+    )
+    st.dataframe(registry.usage())
+
+
+# MAIN APP LOGIC
+
+
+PAGES = {
+    "Home": home_page,
+    "AI Diagnosis": diagnosis_page,
+    "Health Insights": health_insights_page,
+    "FAQ": faq_section,
+    "Contact": contact_page,
+    "Medical Resources": medical_resources,
+    "Risk Assessment": risk_assessment,
+    "Prevention Hub": prevention_hub,
+    "Disease Encyclopedia": disease_insights,
+    "Admin": admin_page,
+}
+
+
+def main():
+    metrics.start_exporters()
+    with metrics.span("page_render", page="sidebar"):
+        sidebar()
+
+    page = st.session_state.page
+    if page not in PAGES or (page == "Admin" and not config.ADMIN_PANEL):
+        page = "Home"
+    with metrics.span("page_render", page=page):
+        PAGES[page]()
+    # Keep every session within its memory budget now that this run has touched its artifacts
+    session_memory.get_default_registry().enforce()
+    
+
+if __name__ == "__main__":
+    main()
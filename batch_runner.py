@@ -0,0 +1,41 @@
+import threading
+import time
+
+import config
+
+
+class RateLimiter:
+    """Token bucket allowing `per_minute` acquisitions per minute, with bursts of up to `burst`."""
+
+    def __init__(self, per_minute, burst=1):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Process-wide limiter shared by every batch item, whichever session or job worker runs it
+# (None when MEDISCAN_BATCH_REQUESTS_PER_MINUTE is 0)
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_batch_limiter():
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None and config.BATCH_REQUESTS_PER_MINUTE:
+            _default_limiter = RateLimiter(config.BATCH_REQUESTS_PER_MINUTE, burst=config.BATCH_MAX_WORKERS)
+        return _default_limiter
@@ -0,0 +1,386 @@
+"""End-to-end load benchmark: replays a request mix against the analyses and drives every app page.
+
+    python benchmarks/load_replay.py [--requests 200] [--concurrency 8] [--latency 0.5]
+                                     [--mix symptoms=5,image=3,report=2] [--replay mix.jsonl]
+                                     [--record mix.jsonl] [--no-cache] [--baseline old.json]
+                                     [--output load.json]
+
+The load phase sends a synthetic (or recorded, --replay) mix of symptom combinations, images of
+several sizes and reports of several lengths through diagnosis_core at the target concurrency, the
+same code path the pages and the HTTP API use. The pages phase runs the Streamlit script with
+AppTest, renders every page and performs the main interaction on each (symptom check, adding a
+Health Insights entry, a risk assessment...).
+
+Everything runs against the stub model backend with --latency seconds per call, in a throwaway data
+directory. The JSON report holds throughput, p50/p95/p99 latency per request kind, per-stage timings
+from the metrics registry, page timings and peak RSS. With --baseline the key figures are compared
+against an earlier report.
+
+Mix files are JSON lines, one request each:
+    {"kind": "symptoms", "symptoms": ["Fever", "Cough"], "duration": "1-3 days", "severity": "Moderate"}
+    {"kind": "image", "width": 2048, "height": 1536, "format": "JPEG", "seed": 7}
+    {"kind": "report", "format": "csv", "lines": 500, "seed": 3}
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from startup import APP, PAGES, timed_run  # noqa: E402
+
+IMAGE_SIZES = [(256, 256), (1024, 768), (3000, 2000)]
+REPORT_LINES = [40, 1500, 12000]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(samples):
+    import metrics
+
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": metrics.percentile(samples, 50),
+        "p95": metrics.percentile(samples, 95),
+        "p99": metrics.percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+# REQUEST MIX
+
+
+def synthetic_mix(count, weights, seed):
+    import diagnosis_core
+
+    rng = random.Random(seed)
+    kinds = list(weights)
+    mix = []
+    for index in range(count):
+        kind = rng.choices(kinds, [weights[k] for k in kinds])[0]
+        if kind == "symptoms":
+            mix.append({
+                "kind": kind,
+                "symptoms": rng.sample(diagnosis_core.SYMPTOM_OPTIONS, rng.randint(1, 4)),
+                "duration": rng.choice(diagnosis_core.DURATION_OPTIONS),
+                "severity": rng.choice(diagnosis_core.SEVERITY_OPTIONS),
+            })
+        elif kind == "image":
+            width, height = rng.choice(IMAGE_SIZES)
+            mix.append({"kind": kind, "width": width, "height": height, "format": rng.choice(["PNG", "JPEG"]), "seed": index})
+        else:
+            mix.append({"kind": kind, "format": rng.choice(["txt", "csv"]), "lines": rng.choice(REPORT_LINES), "seed": index})
+    return mix
+
+
+def make_image(spec):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(spec.get("seed", 0))
+    # Smooth gradient plus noise, so encoders do real work without producing absurd file sizes
+    y, x = np.mgrid[0:spec["height"], 0:spec["width"]]
+    base = ((x + y) * 255 // (spec["width"] + spec["height"])).astype(np.uint8)
+    pixels = np.stack([base, base[::-1], base[:, ::-1]], axis=-1)
+    pixels = np.clip(pixels + rng.integers(0, 32, pixels.shape, dtype=np.uint8), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buffer, spec.get("format", "PNG"))
+    return buffer.getvalue()
+
+
+def make_report(spec):
+    import lab_csv
+
+    rng = random.Random(spec.get("seed", 0))
+    with open(lab_csv.REFERENCE_RANGES_PATH, newline="") as f:
+        ranges = list(csv.DictReader(f))
+    rows = []
+    for _ in range(spec["lines"]):
+        ref = rng.choice(ranges)
+        low = float(ref["low"] or 0)
+        high = float(ref["high"] or low * 2 + 10)
+        # Mostly in range, with the tails out of range in both directions
+        value = round(rng.uniform(low * 0.7, high * 1.3), 1)
+        rows.append((ref["analyte"], value, ref["unit"]))
+    if spec.get("format") == "csv":
+        text = "test,value,unit\n" + "\n".join(f"{name},{value},{unit}" for name, value, unit in rows)
+        return text.encode(), "panel.csv", "text/csv"
+    text = "\n".join(f"{name}: {value} {unit}" for name, value, unit in rows)
+    return text.encode(), "report.txt", "text/plain"
+
+
+def materialize(spec):
+    """Build the call for one request up front, so payload generation is not timed."""
+    import diagnosis_core
+
+    if spec["kind"] == "symptoms":
+        return lambda on_text: diagnosis_core.analyze_symptoms(
+            spec["symptoms"], spec["duration"], spec["severity"], on_text=on_text
+        )
+    if spec["kind"] == "image":
+        data = make_image(spec)
+        return lambda on_text: diagnosis_core.analyze_image(data, on_text=on_text)
+    data, filename, content_type = make_report(spec)
+    return lambda on_text: diagnosis_core.analyze_report(data, filename, content_type, on_text=on_text)
+
+
+# LOAD PHASE
+
+
+def run_load(mix, concurrency, stream):
+    calls = [(spec["kind"], materialize(spec)) for spec in mix]
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def one(kind, call):
+        start = time.perf_counter()
+        try:
+            call((lambda text: None) if stream else None)
+        except Exception as e:
+            with lock:
+                errors.setdefault(kind, {}).setdefault(type(e).__name__, 0)
+                errors[kind][type(e).__name__] += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(kind, []).append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for kind, call in calls:
+            pool.submit(one, kind, call)
+    wall = time.perf_counter() - start
+
+    everything = [seconds for samples in latencies.values() for seconds in samples]
+    return {
+        "requests": len(calls),
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "throughput_rps": len(everything) / wall if wall else 0.0,
+        "latency_seconds": summarize(everything),
+        "by_kind": {kind: summarize(samples) for kind, samples in sorted(latencies.items())},
+        "errors": errors,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def stage_timings():
+    import metrics
+
+    stages = {}
+    for timing in metrics.snapshot()["timings"]:
+        label = ",".join(f"{k}={v}" for k, v in sorted(timing["labels"].items()))
+        name = f"{timing['name']}{{{label}}}" if label else timing["name"]
+        stages[name] = {key: timing[key] for key in ("count", "p50", "p95", "p99", "max")}
+    return stages
+
+
+# PAGES PHASE
+
+
+def wait_for_success(app, timeout=60.0):
+    # Background jobs finish on worker threads; rerun until the result area shows them
+    deadline = time.monotonic() + timeout
+    while not app.success and not app.error and time.monotonic() < deadline:
+        time.sleep(0.05)
+        app.run()
+
+
+def button(app, label):
+    return next(b for b in app.button if b.label == label)
+
+
+def interactions(app):
+    """Main interaction of each page, as (name, page, action) tuples."""
+
+    def check_symptoms():
+        app.multiselect[0].set_value(app.multiselect[0].options[:3])
+        app.run()
+        button(app, "Check Possible Conditions").click()
+        app.run()
+        wait_for_success(app)
+
+    def add_reading():
+        app.number_input[0].set_value(random.randint(100, 160))
+        button(app, "Add Entry").click()
+        app.run()
+
+    def change_window():
+        app.selectbox[0].set_value(app.selectbox[0].options[0])
+        app.run()
+
+    def assess_risk():
+        app.slider[0].set_value(55)
+        app.number_input[0].set_value(31.0)
+        button(app, "Assess Risk").click()
+        app.run()
+
+    def browse_condition():
+        app.selectbox[0].set_value(app.selectbox[0].options[2])
+        app.run()
+
+    return [
+        ("symptom_check", "AI Diagnosis", check_symptoms),
+        ("add_health_entry", "Health Insights", add_reading),
+        ("change_health_window", "Health Insights", change_window),
+        ("risk_assessment", "Risk Assessment", assess_risk),
+        ("browse_condition", "Disease Encyclopedia", browse_condition),
+    ]
+
+
+def run_pages(reruns):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(APP), default_timeout=120)
+    cold = timed_run(app)
+    pages = {}
+    for page in PAGES:
+        app.session_state.page = page
+        samples = [timed_run(app) for _ in range(reruns)]
+        pages[page] = {
+            "render_seconds": summarize(samples),
+            "exceptions": [str(e.value) for e in app.exception],
+        }
+
+    actions = {}
+    for name, page, action in interactions(app):
+        app.session_state.page = page
+        app.run()
+        samples = []
+        for _ in range(reruns):
+            start = time.perf_counter()
+            action()
+            samples.append(time.perf_counter() - start)
+        actions[name] = {
+            "page": page,
+            "seconds": summarize(samples),
+            "exceptions": [str(e.value) for e in app.exception],
+        }
+    return {"cold_run_seconds": cold, "pages": pages, "interactions": actions, "peak_rss_mb": peak_rss_mb()}
+
+
+# REPORT
+
+
+def compare(report, baseline):
+    """Relative change of the headline figures (new / old); > 1 means larger in this run."""
+
+    def ratio(new, old):
+        return new / old if new is not None and old else None
+
+    load, old_load = report.get("load", {}), baseline.get("load", {})
+    comparison = {
+        "throughput_rps": ratio(load.get("throughput_rps"), old_load.get("throughput_rps")),
+        "peak_rss_mb": ratio(report.get("peak_rss_mb"), baseline.get("peak_rss_mb")),
+        "by_kind_p95": {},
+        "pages_p50": {},
+    }
+    for kind, stats in load.get("by_kind", {}).items():
+        old = old_load.get("by_kind", {}).get(kind, {})
+        comparison["by_kind_p95"][kind] = ratio(stats.get("p95"), old.get("p95"))
+    old_pages = baseline.get("pages", {}).get("pages", {})
+    for page, stats in report.get("pages", {}).get("pages", {}).items():
+        old = old_pages.get(page, {}).get("render_seconds", {})
+        comparison["pages_p50"][page] = ratio(stats["render_seconds"].get("p50"), old.get("p50"))
+    return comparison
+
+
+def parse_mix(text):
+    weights = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in ("symptoms", "image", "report"):
+            raise argparse.ArgumentTypeError(f"unknown request kind: {kind}")
+        weights[kind] = float(weight or 1)
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="synthetic requests to send (default 200)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub model latency per call in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("symptoms=5,image=3,report=2"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="JSON lines file of requests to send instead of a synthetic mix")
+    parser.add_argument("--record", help="write the request mix that was sent to this JSON lines file")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--no-stream", action="store_true", help="wait for whole responses instead of streaming")
+    parser.add_argument("--page-reruns", type=int, default=3, help="renders and interactions per page (0 skips pages)")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Settings are read at import time, so they must be in place before any project module loads
+    os.environ["MEDISCAN_MODEL_BACKEND"] = "stub"
+    os.environ["MEDISCAN_STUB_LATENCY_SECONDS"] = str(args.latency)
+    os.environ.setdefault("MEDISCAN_DATA_DIR", tempfile.mkdtemp(prefix="mediscan-bench-"))
+    if args.no_cache:
+        os.environ["MEDISCAN_CACHE_TTL_SECONDS"] = "0"
+
+    import metrics
+
+    if args.replay:
+        with open(args.replay) as f:
+            mix = [json.loads(line) for line in f if line.strip()]
+    else:
+        mix = synthetic_mix(args.requests, args.mix, args.seed)
+    if args.record:
+        with open(args.record, "w") as f:
+            f.writelines(json.dumps(spec) + "\n" for spec in mix)
+
+    report = {
+        "python": sys.version.split()[0],
+        "settings": {
+            "stub_latency_seconds": args.latency,
+            "concurrency": args.concurrency,
+            "cache": not args.no_cache,
+            "stream": not args.no_stream,
+            "mix": args.replay or args.mix,
+        },
+        "load": run_load(mix, args.concurrency, not args.no_stream),
+        "stages": stage_timings(),
+    }
+    metrics.reset()
+    if args.page_reruns:
+        report["pages"] = run_pages(args.page_reruns)
+        report["page_stages"] = stage_timings()
+    report["peak_rss_mb"] = peak_rss_mb()
+    if args.baseline:
+        report["comparison"] = compare(report, json.loads(Path(args.baseline).read_text()))
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
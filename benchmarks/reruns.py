@@ -0,0 +1,166 @@
+"""Rerun latency of the app's interactive regions, before and after fragment-scoped rendering.
+
+    python benchmarks/reruns.py [--reruns 10] [--before REV] [--readings 5000] [--output reruns.json]
+
+Each interaction (navigating, adding a Health Insights reading, changing its window, picking symptoms,
+assessing risk) is repeated and timed two ways:
+
+- full_rerun_seconds: a whole script run, which is what every interaction cost before the page
+  was split into fragments (and what navigation still costs);
+- fragment_seconds: the render time of the fragment that owns the widget, i.e. what a live server
+  reruns for that interaction now. AppTest always runs the whole script, so this is read from the
+  fragment_render_seconds metric recorded during the run.
+
+--before REV also times the app script as it was at git revision REV (e.g. the commit before fragments
+were introduced) for a direct comparison. Runs against the stub model backend with a temporary data
+directory seeded with --readings Health Insights readings.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "app_medical_diagnosis.py"
+# Health Insights readings are per session; the benchmark session is given this ID. Older revisions
+# of the app shared one "default" user, so it is seeded too for --before runs.
+USER_IDS = ["benchmark", "default"]
+
+
+def seed_readings(count, seed=0):
+    import health_store
+
+    rng = random.Random(seed)
+    now = time.time()
+    rows = [
+        (now - (count - i) * 365 * 86400 / count, rng.gauss(125, 12), rng.gauss(200, 25), rng.gauss(75, 9))
+        for i in range(count)
+    ]
+    for user_id in USER_IDS:
+        store = health_store.HealthStore(user_id)
+        store.extend(rows)
+        store.close()
+
+
+def fragment_seconds(name):
+    import metrics
+
+    return sum(
+        t["sum"] for t in metrics.snapshot()["timings"]
+        if t["name"] == "fragment_render_seconds" and t["labels"].get("fragment") == name
+    )
+
+
+def interactions(app):
+    """(name, page, fragment, action) tuples; the fragment is None when the interaction needs a full rerun."""
+
+    def widget(elements, label):
+        return next(e for e in elements if e.label == label)
+
+    pages = ["Health Insights", "Home"]
+
+    def navigate():
+        pages.reverse()
+        widget(app.button, f" {pages[0]}").click()
+
+    def add_reading():
+        widget(app.number_input, "Blood Pressure (mm Hg)").set_value(random.randint(100, 160))
+        widget(app.button, "Add Entry").click()
+
+    def change_window():
+        select = widget(app.selectbox, "Show readings from")
+        select.set_value(select.options[1] if select.value == select.options[2] else select.options[2])
+
+    def pick_symptoms():
+        select = widget(app.multiselect, "Choose your symptoms:")
+        select.set_value(random.sample(select.options, 2))
+
+    def assess_risk():
+        widget(app.slider, "Your Age").set_value(random.randint(20, 80))
+        widget(app.button, "Assess Risk").click()
+
+    return [
+        ("navigate", "Home", None, navigate),
+        ("add_health_entry", "Health Insights", "health_dashboard", add_reading),
+        ("change_health_window", "Health Insights", "health_dashboard", change_window),
+        ("pick_symptoms", "AI Diagnosis", "symptom_checker", pick_symptoms),
+        ("assess_risk", "Risk Assessment", "risk_form", assess_risk),
+    ]
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {"median": statistics.median(samples), "max": max(samples)}
+
+
+def measure(script, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(script), default_timeout=120)
+    app.session_state.user_id = USER_IDS[0]
+    app.run()
+    results = {}
+    for name, page, fragment, action in interactions(app):
+        app.session_state.page = page
+        app.run()
+        full, partial = [], []
+        for _ in range(reruns):
+            action()
+            before = fragment_seconds(fragment)
+            start = time.perf_counter()
+            app.run()
+            full.append(time.perf_counter() - start)
+            if fragment is not None and fragment_seconds(fragment) > before:
+                partial.append(fragment_seconds(fragment) - before)
+        results[name] = {
+            "full_rerun_seconds": summarize(full),
+            "fragment_seconds": summarize(partial),
+            "exceptions": [str(e.value) for e in app.exception],
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=10, help="repetitions per interaction (default 10)")
+    parser.add_argument("--before", metavar="REV", help="also time the app script from this git revision")
+    parser.add_argument("--readings", type=int, default=5000, help="Health Insights readings to seed (default 5000)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("MEDISCAN_MODEL_BACKEND", "stub")
+    os.environ.setdefault("MEDISCAN_DATA_DIR", tempfile.mkdtemp(prefix="mediscan-reruns-"))
+    sys.path.insert(0, str(ROOT))
+    seed_readings(args.readings)
+
+    report = {"python": sys.version.split()[0], "readings": args.readings, "after": measure(APP, args.reruns)}
+    if args.before:
+        source = subprocess.run(
+            ["git", "show", f"{args.before}:{APP.name}"], capture_output=True, text=True, cwd=ROOT, check=True
+        ).stdout
+        with tempfile.TemporaryDirectory() as directory:
+            script = Path(directory) / APP.name
+            script.write_text(source)
+            report["before"] = measure(script, args.reruns)
+        # Old full rerun over what the same interaction reruns now (its fragment, or the whole script)
+        report["speedup"] = {}
+        for name, before in report["before"].items():
+            after = report["after"][name]["fragment_seconds"] or report["after"][name]["full_rerun_seconds"]
+            report["speedup"][name] = round(before["full_rerun_seconds"]["median"] / after["median"], 2)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Cold-start and per-page rerun benchmark for the Streamlit app.
+
+    python benchmarks/startup.py [--reruns 5] [--output startup.json]
+
+Reports the import time of each heavy dependency (measured in a fresh interpreter), the cold first
+run of the app script, and the first and median rerun time of every page. Runs against the stub
+model backend, so no network access is needed.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "app_medical_diagnosis.py"
+
+HEAVY_MODULES = [
+    "streamlit",
+    "pandas",
+    "numpy",
+    "matplotlib.pyplot",
+    "seaborn",
+    "PIL.Image",
+    "pypdf",
+    "google.generativeai",
+]
+
+PAGES = [
+    "Home",
+    "AI Diagnosis",
+    "Health Insights",
+    "Disease Encyclopedia",
+    "Prevention Hub",
+    "Risk Assessment",
+    "Medical Resources",
+    "FAQ",
+    "Contact",
+]
+
+
+def import_time(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def timed_run(app):
+    start = time.perf_counter()
+    app.run()
+    return time.perf_counter() - start
+
+
+def page_times(reruns):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(APP), default_timeout=120)
+    cold = timed_run(app)
+    pages = {}
+    for page in PAGES:
+        app.session_state.page = page
+        samples = [timed_run(app) for _ in range(reruns)]
+        pages[page] = {
+            "first_seconds": samples[0],
+            "median_rerun_seconds": statistics.median(samples[1:] or samples),
+            "exceptions": [str(e.value) for e in app.exception],
+        }
+    return cold, pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=5, help="reruns per page (default 5)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("MEDISCAN_MODEL_BACKEND", "stub")
+    sys.path.insert(0, str(ROOT))
+
+    imports = {module: import_time(module) for module in HEAVY_MODULES}
+    cold, pages = page_times(args.reruns)
+    report = {
+        "python": sys.version.split()[0],
+        "import_seconds": imports,
+        "cold_run_seconds": cold,
+        "pages": pages,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import hashlib
+import io
+import threading
+import time
+
+import numpy as np
+
+import config
+import metrics
+from response_cache import ResponseCache
+
+
+# Rendered PNGs keyed by a digest of the plotted data and the plot spec, shared by all sessions
+_cache = ResponseCache(max_items=config.CHART_CACHE_ITEMS, ttl_seconds=None, name="charts")
+_live_figures = 0
+_live_lock = threading.Lock()
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the points to keep.
+
+    Keeps the first and last points and, from each bucket in between, the point forming the largest
+    triangle with the previously kept point and the next bucket's average, so peaks survive.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        bucket_x = x[start:stop]
+        bucket_y = y[start:stop]
+        area = np.abs(
+            (x[previous] - avg_x) * (bucket_y - y[previous]) - (x[previous] - bucket_x) * (avg_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        keep[i + 1] = previous
+    return keep
+
+
+def data_digest(*arrays):
+    digest = hashlib.blake2b(digest_size=16)
+    for values in arrays:
+        values = np.ascontiguousarray(values)
+        digest.update(str(values.dtype).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def line_chart_png(dates, values, title, color=None, max_points=None):
+    """Render a line chart of values over dates to PNG bytes, cached by data and plot spec."""
+    max_points = max_points or config.CHART_MAX_POINTS
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    values = np.asarray(values, dtype=np.float64)
+    key = "|".join(("line", title, str(color), str(max_points), data_digest(dates, values)))
+
+    png = _cache.get(key)
+    if png is not None:
+        metrics.increment("chart_cache_total", result="hit")
+        return png
+    metrics.increment("chart_cache_total", result="miss")
+
+    start = time.perf_counter()
+    keep = lttb(dates.astype(np.int64), values, max_points)
+    png = _render(dates[keep], values[keep], title, color)
+    metrics.observe("chart_render_seconds", time.perf_counter() - start)
+    metrics.observe("chart_points_plotted", len(keep))
+    metrics.observe("chart_points_raw", len(values))
+    _cache.set(key, png)
+    return png
+
+
+def _render(dates, values, title, color):
+    global _live_figures
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    # Figures are created outside pyplot so no global registry keeps them alive
+    fig = Figure(figsize=(10, 4))
+    with _live_lock:
+        _live_figures += 1
+        metrics.set_gauge("chart_live_figures", _live_figures)
+    try:
+        ax = fig.subplots()
+        sns.lineplot(x=dates, y=values, marker="o" if len(values) <= 100 else None, color=color, ax=ax, estimator=None)
+        ax.set_title(title)
+        fig.autofmt_xdate()
+        out = io.BytesIO()
+        fig.savefig(out, format="png", bbox_inches="tight")
+        return out.getvalue()
+    finally:
+        fig.clear()
+        with _live_lock:
+            _live_figures -= 1
+            metrics.set_gauge("chart_live_figures", _live_figures)
+
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,118 @@
+import os
+from pathlib import Path
+
+
+# Runtime settings. Every value can be overridden with a MEDISCAN_* environment variable.
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("MEDISCAN_DATA_DIR", BASE_DIR / ".mediscan"))
+
+# Static assets
+ASSETS_DIR = Path(os.environ.get("MEDISCAN_ASSETS_DIR", r"C:\Users\MR COMPUTER\Desktop\My Projects\medical_detection_app"))
+STYLE_PATH = Path(os.environ.get("MEDISCAN_STYLE_PATH", ASSETS_DIR / "style.css"))
+LOGO_PATH = Path(os.environ.get("MEDISCAN_LOGO_PATH", ASSETS_DIR / "Screenshot 2025-04-28 224724.png"))
+
+# Response cache
+CACHE_DIR = Path(os.environ.get("MEDISCAN_CACHE_DIR", DATA_DIR / "cache"))
+CACHE_TTL_SECONDS = int(os.environ.get("MEDISCAN_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+CACHE_MEMORY_ITEMS = int(os.environ.get("MEDISCAN_CACHE_MEMORY_ITEMS", 512))
+CACHE_DISK_MAX_BYTES = int(os.environ.get("MEDISCAN_CACHE_DISK_MAX_BYTES", 64 * 1024 * 1024))
+# Persistent tier behind the in-memory LRU: sqlite (one WAL-mode file shared safely by every worker
+# process), disk (one JSON file per entry in CACHE_DIR) or memory (per-process only)
+CACHE_BACKEND = os.environ.get("MEDISCAN_CACHE_BACKEND", "sqlite")
+CACHE_DB_PATH = Path(os.environ.get("MEDISCAN_CACHE_DB_PATH", DATA_DIR / "cache.sqlite3"))
+
+# Render model output into the result cards as it is generated
+STREAMING_ENABLED = os.environ.get("MEDISCAN_STREAMING", "1") == "1"
+
+# Report analysis: token budget per chunk and concurrent chunk analyses
+REPORT_CHUNK_TOKENS = int(os.environ.get("MEDISCAN_REPORT_CHUNK_TOKENS", 6000))
+REPORT_MAP_WORKERS = int(os.environ.get("MEDISCAN_REPORT_MAP_WORKERS", 4))
+
+# Rows parsed per chunk when pre-screening CSV lab reports
+LAB_CSV_CHUNK_ROWS = int(os.environ.get("MEDISCAN_LAB_CSV_CHUNK_ROWS", 50000))
+# Rows that could not be screened (no bundled range, unit mismatch, non-numeric value) are sent
+# verbatim, up to this many
+LAB_CSV_UNSCREENED_MAX_ROWS = int(os.environ.get("MEDISCAN_LAB_CSV_UNSCREENED_MAX_ROWS", 200))
+
+# Image analysis: uploads are downscaled and re-encoded before being sent to the model
+IMAGE_MAX_SIDE = int(os.environ.get("MEDISCAN_IMAGE_MAX_SIDE", 1024))
+IMAGE_FORMAT = os.environ.get("MEDISCAN_IMAGE_FORMAT", "JPEG")
+IMAGE_QUALITY = int(os.environ.get("MEDISCAN_IMAGE_QUALITY", 85))
+
+# Batch image analysis: worker threads for batch jobs (apart from JOB_WORKERS) and the overall rate of
+# their model calls (0 = unlimited)
+BATCH_MAX_WORKERS = int(os.environ.get("MEDISCAN_BATCH_MAX_WORKERS", 4))
+BATCH_REQUESTS_PER_MINUTE = int(os.environ.get("MEDISCAN_BATCH_REQUESTS_PER_MINUTE", 60))
+
+# Model client. MEDISCAN_MODEL_BACKEND=stub swaps Gemini for an in-process stub (no network).
+MODEL_BACKEND = os.environ.get("MEDISCAN_MODEL_BACKEND", "gemini")
+MODEL_TIMEOUT_SECONDS = float(os.environ.get("MEDISCAN_MODEL_TIMEOUT_SECONDS", 60))
+MODEL_MAX_RETRIES = int(os.environ.get("MEDISCAN_MODEL_MAX_RETRIES", 3))
+# Send a second identical request if the first has not answered after this many seconds (0 = off)
+MODEL_HEDGE_AFTER_SECONDS = float(os.environ.get("MEDISCAN_MODEL_HEDGE_AFTER_SECONDS", 0))
+# Let concurrent identical requests share one upstream call
+MODEL_COALESCE = os.environ.get("MEDISCAN_MODEL_COALESCE", "1") == "1"
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("MEDISCAN_CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("MEDISCAN_CIRCUIT_RESET_SECONDS", 30))
+# Prompt budget per model call (estimated tokens, system instruction included); longer prompts are trimmed
+MODEL_MAX_PROMPT_TOKENS = int(os.environ.get("MEDISCAN_MODEL_MAX_PROMPT_TOKENS", 16000))
+# Follow-up questions on a result: earlier turns are dropped, oldest first, to keep this many tokens of history
+FOLLOW_UP_HISTORY_TOKENS = int(os.environ.get("MEDISCAN_FOLLOW_UP_HISTORY_TOKENS", 6000))
+STUB_LATENCY_SECONDS = float(os.environ.get("MEDISCAN_STUB_LATENCY_SECONDS", 0.5))
+STUB_ERROR_RATE = float(os.environ.get("MEDISCAN_STUB_ERROR_RATE", 0))
+
+# Health Insights readings (SQLite, appended one row per entry)
+HEALTH_DB_PATH = Path(os.environ.get("MEDISCAN_HEALTH_DB_PATH", DATA_DIR / "health.sqlite3"))
+# Health Insights trends: trailing window for recent statistics, EWMA smoothing per reading, and the
+# z-score (against the trailing window) above which a reading is flagged as unusual
+HEALTH_ROLLING_DAYS = float(os.environ.get("MEDISCAN_HEALTH_ROLLING_DAYS", 7))
+HEALTH_EWMA_ALPHA = float(os.environ.get("MEDISCAN_HEALTH_EWMA_ALPHA", 0.1))
+HEALTH_ANOMALY_Z = float(os.environ.get("MEDISCAN_HEALTH_ANOMALY_Z", 3.0))
+
+# Health Insights charts: points plotted per series after downsampling, and rendered charts kept in memory
+CHART_MAX_POINTS = int(os.environ.get("MEDISCAN_CHART_MAX_POINTS", 500))
+CHART_CACHE_ITEMS = int(os.environ.get("MEDISCAN_CHART_CACHE_ITEMS", 128))
+
+# Risk scoring: rows per chunk when scoring CSV rosters
+RISK_CHUNK_ROWS = int(os.environ.get("MEDISCAN_RISK_CHUNK_ROWS", 100000))
+
+# Headless HTTP API (api_server.py)
+API_HOST = os.environ.get("MEDISCAN_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("MEDISCAN_API_PORT", 8600))
+API_MAX_CONCURRENT = int(os.environ.get("MEDISCAN_API_MAX_CONCURRENT", 8))
+API_MAX_QUEUE = int(os.environ.get("MEDISCAN_API_MAX_QUEUE", 32))
+API_MAX_BODY_BYTES = int(os.environ.get("MEDISCAN_API_MAX_BODY_BYTES", 25 * 1024 * 1024))
+
+# Background analysis jobs (SQLite queue shared by every session and server process)
+JOB_DB_PATH = Path(os.environ.get("MEDISCAN_JOB_DB_PATH", DATA_DIR / "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("MEDISCAN_JOB_WORKERS", 4))
+# How often a page refreshes the result area of a running job
+JOB_POLL_SECONDS = float(os.environ.get("MEDISCAN_JOB_POLL_SECONDS", 1.0))
+# Resubmitting identical input within this window reuses the finished job instead of re-running it
+JOB_RESULT_TTL_SECONDS = int(os.environ.get("MEDISCAN_JOB_RESULT_TTL_SECONDS", 3600))
+# Running jobs older than this are assumed orphaned by a restart and queued again
+JOB_STALE_SECONDS = int(os.environ.get("MEDISCAN_JOB_STALE_SECONDS", 600))
+JOB_RETENTION_SECONDS = int(os.environ.get("MEDISCAN_JOB_RETENTION_SECONDS", 86400))
+# How often a worker requeues orphaned jobs and deletes jobs past retention
+JOB_MAINTENANCE_SECONDS = float(os.environ.get("MEDISCAN_JOB_MAINTENANCE_SECONDS", 300))
+
+# Metrics export in Prometheus text format: a file rewritten every METRICS_EXPORT_SECONDS and/or an
+# HTTP endpoint on METRICS_PORT (empty path / port 0 = off)
+METRICS_EXPORT_PATH = os.environ.get("MEDISCAN_METRICS_EXPORT_PATH", "")
+METRICS_EXPORT_SECONDS = float(os.environ.get("MEDISCAN_METRICS_EXPORT_SECONDS", 15))
+METRICS_HOST = os.environ.get("MEDISCAN_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("MEDISCAN_METRICS_PORT", 0))
+# Show the Admin page (live metrics and cache stats) in the sidebar
+ADMIN_PANEL = os.environ.get("MEDISCAN_ADMIN_PANEL", "0") == "1"
+
+# DICOM studies: multi-frame studies are sent as a mosaic of up to this many evenly spaced frames
+DICOM_MOSAIC_FRAMES = int(os.environ.get("MEDISCAN_DICOM_MOSAIC_FRAMES", 9))
+# Uploaded studies are spooled here (named by content hash) and removed after UPLOAD_TTL_SECONDS unused
+UPLOAD_DIR = Path(os.environ.get("MEDISCAN_UPLOAD_DIR", DATA_DIR / "uploads"))
+UPLOAD_TTL_SECONDS = int(os.environ.get("MEDISCAN_UPLOAD_TTL_SECONDS", 24 * 3600))
+
+# Per-session memory budgets (approximate bytes of what sessions keep in memory, e.g. Health Insights
+# windows). Over budget, the least recently used artifacts are released and reloaded when needed
+SESSION_MAX_BYTES = int(os.environ.get("MEDISCAN_SESSION_MAX_BYTES", 64 * 1024 * 1024))
+SESSION_TOTAL_MAX_BYTES = int(os.environ.get("MEDISCAN_SESSION_TOTAL_MAX_BYTES", 1024 * 1024 * 1024))
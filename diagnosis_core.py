@@ -0,0 +1,322 @@
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from api_key import api_key
+import config
+import metrics
+import model_client
+import response_cache
+import streaming
+
+
+# UI-independent image, report and symptom analyses shared by the Streamlit app and the HTTP API.
+# Both front ends therefore go through the same model client, caches and metrics.
+
+
+MODEL_NAME = "gemini-1.5-flash"
+
+# Generation config
+generation_config = {
+    "temperature": 0.4,
+    "top_p": 1,
+    "top_k": 32,
+    "max_output_tokens": 4096
+}
+
+safety_settings = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+
+system_prompt = """You are a professional AI Medical Health Assistant. Your purpose is to provide clear, evidence-based general health information and predictive insights based on symptoms, medical history, and lifestyle factors shared by the user.
+
+Your key responsibilities include:
+
+Support, Not Diagnose:
+
+You do not provide medical diagnoses or treatment plans.
+
+You do help users better understand possible health conditions, explain medical concepts, and suggest appropriate next steps such as lifestyle adjustments or when to consult a healthcare professional.
+
+Evidence-Based Guidance:
+
+All information should be grounded in current, reputable clinical sources (e.g., CDC, WHO, Mayo Clinic, NICE guidelines).
+
+Where relevant, cite standard clinical practices or widely accepted health recommendations.
+
+Clear and Compassionate Communication:
+
+Use language that is simple, respectful, and reassuring—never alarming.
+
+If uncertainty exists, acknowledge it honestly and encourage the user to seek professional medical advice.
+
+Always emphasize that no online tool can replace a qualified healthcare provider.
+
+Privacy and Safety First:
+
+Do not store, retain, or share any personal health information.
+
+Avoid speculative or unsafe suggestions, even if prompted.
+
+When in doubt, prioritize safety and recommend professional evaluation.
+
+Scope and Boundaries:
+
+Avoid making assumptions or offering unsupported conclusions.
+
+Do not interpret lab results, imaging, or conduct risk assessments unless explicitly supported by clinical guidelines and generalizable data.
+
+Example Disclaimer (to include in interactions):
+“Please note: I am an AI health assistant and not a licensed medical professional. The information I provide is for general guidance only and should not be considered a medical diagnosis or a substitute for professional medical advice. If you are experiencing symptoms or have health concerns, please consult a licensed healthcare provider promptly.” """
+
+IMAGE_PROMPT = """
+You are a medical imaging specialist analyzing this image. Provide:
+1. A professional assessment of any visible abnormalities
+2. Potential conditions that could explain these findings
+3. Recommended next steps (imaging follow-up, specialist consultation)
+4. Urgency level (routine, moderate, urgent)
+
+Be factual but compassionate. Always remind this is not a diagnosis.
+"""
+
+SYMPTOM_OPTIONS = [
+    "Fever", "Cough", "Chest Pain", "Shortness of Breath", "Fatigue",
+    "Nausea", "Headache", "Abdominal Pain", "Joint Pain", "Skin Rash"
+]
+DURATION_OPTIONS = ["Less than 24 hours", "1-3 days", "3-7 days", "1-2 weeks", "More than 2 weeks"]
+SEVERITY_OPTIONS = ["Mild", "Moderate", "Severe"]
+
+SYMPTOM_PROMPT = """
+A user reports these symptoms:
+- Main symptoms: {symptoms}
+- Duration: {duration}
+- Severity: {severity}
+
+Provide:
+1. 2-3 most likely general conditions (not diagnoses)
+2. Recommended self-care measures
+3. When to seek medical attention
+4. Red flag symptoms to watch for
+
+Be conservative and always recommend professional evaluation when uncertain.
+"""
+
+REPORT_TYPES = {".pdf": "application/pdf", ".txt": "text/plain", ".csv": "text/csv"}
+
+# Opens a follow-up conversation; the analysis itself is the first model turn
+FOLLOW_UP_CONTEXT = """
+You produced the {analysis} analysis in your next message. The original {analysis} input is not
+repeated here. Answer the user's follow-up questions using that analysis, and say so when a question
+cannot be answered from it.
+"""
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+@dataclass
+class AnalysisResult:
+    text: str
+    cached: bool = False
+    first_chunk_seconds: float = 0.0
+    total_seconds: float = 0.0
+    details: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+# MODEL CLIENT
+
+
+# One client per process: retry/circuit-breaker state, coalescing and the backend's
+# connection are shared by every session and every API request.
+_client = None
+_client_lock = threading.Lock()
+
+# Cached answers depend on the system instruction as well as the generation config
+cache_config = {**generation_config, "system_instruction": model_client.request_key(system_prompt)}
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            # The system prompt is sent as the model's system instruction, not repeated in every prompt
+            _client = model_client.build_client(
+                MODEL_NAME, generation_config, safety_settings, api_key, system_instruction=system_prompt
+            )
+        return _client
+
+
+def _generate(contents, analysis, on_text, stream):
+    if stream is None:
+        # Streaming only helps when someone is watching the text arrive
+        stream = config.STREAMING_ENABLED and on_text is not None
+    client = get_client()
+    result = streaming.generate(client, contents, on_text=on_text, stream=stream, analysis=analysis)
+    return AnalysisResult(
+        result.text,
+        first_chunk_seconds=result.first_chunk_seconds,
+        total_seconds=result.total_seconds,
+        details={"prompt_tokens": client.prompt_tokens(contents)},
+    )
+
+
+def _from_cache(text, on_text, analysis):
+    metrics.increment("analysis_cache_hits_total", analysis=analysis)
+    if on_text is not None:
+        on_text(text)
+    return AnalysisResult(text, cached=True)
+
+
+# ANALYSES
+
+
+@metrics.span("analysis", analysis="symptoms")
+def analyze_symptoms(symptoms, duration, severity, on_text=None, stream=None):
+    if not symptoms:
+        raise InvalidRequest("Please select at least one symptom.")
+    unknown = [s for s in symptoms if s not in SYMPTOM_OPTIONS]
+    if unknown:
+        raise InvalidRequest(f"Unknown symptoms: {', '.join(map(str, unknown))}")
+    if duration not in DURATION_OPTIONS:
+        raise InvalidRequest(f"duration must be one of: {', '.join(DURATION_OPTIONS)}")
+    if severity not in SEVERITY_OPTIONS:
+        raise InvalidRequest(f"severity must be one of: {', '.join(SEVERITY_OPTIONS)}")
+
+    # The option space is small, so most combinations repeat across users
+    cache = response_cache.get_default_cache()
+    cache_key = response_cache.symptom_key(symptoms, duration, severity, MODEL_NAME, cache_config)
+    text = cache.get(cache_key)
+    if text is not None:
+        return _from_cache(text, on_text, "symptoms")
+
+    with metrics.span("prompt_build", analysis="symptoms"):
+        prompt = SYMPTOM_PROMPT.format(symptoms=", ".join(symptoms), duration=duration, severity=severity)
+    result = _generate(prompt, "symptoms", on_text, stream)
+    cache.set(cache_key, result.text)
+    return result
+
+
+@metrics.span("analysis", analysis="image")
+def analyze_image(data, on_text=None, stream=None, frame=None, before_call=None):
+    """Analyze an image given as bytes or as the path of a spooled upload (see image_pipeline.spool_upload).
+
+    before_call() runs on a cache miss, just before the image is prepared for the model (e.g. to wait
+    for a rate limit).
+    """
+    import image_pipeline
+
+    if isinstance(data, (str, Path)):
+        if not os.path.isfile(data):
+            raise InvalidRequest("The uploaded image is no longer available; please upload it again.")
+        empty = os.path.getsize(data) == 0
+    else:
+        empty = not data
+    if empty:
+        raise InvalidRequest("Image is empty.")
+    # Identical uploads are served from the result cache by content hash
+    digest = image_pipeline.content_hash(data)
+    cache_key, text = image_pipeline.cached_result(digest, IMAGE_PROMPT, MODEL_NAME, cache_config, frame)
+    if text is not None:
+        return _from_cache(text, on_text, "image")
+
+    if before_call is not None:
+        before_call()
+    try:
+        prepared = image_pipeline.preprocess(data, frame=frame, digest=digest)
+    except Exception as e:
+        # Everything preprocess() does is decoding the user's file, so any failure is a bad upload
+        raise InvalidRequest(f"Could not read image: {e}") from e
+    result = _generate([IMAGE_PROMPT, prepared.part()], "image", on_text, stream)
+    result.details.update(
+        width=prepared.width,
+        height=prepared.height,
+        upload_bytes=prepared.upload_bytes,
+        encoded_bytes=len(prepared.data),
+        encode_seconds=prepared.encode_seconds,
+        **(prepared.dicom or {}),
+    )
+    response_cache.get_default_cache().set(cache_key, result.text)
+    return result
+
+
+def report_type(filename="", content_type=""):
+    for suffix, mime in REPORT_TYPES.items():
+        if filename.lower().endswith(suffix) or content_type == mime:
+            return mime
+    raise InvalidRequest("Supported report formats are PDF, TXT and CSV.")
+
+
+@metrics.span("analysis", analysis="report")
+def analyze_report(data, filename="", content_type="", on_text=None, stream=None):
+    import io
+
+    import lab_csv
+    import report_pipeline
+
+    kind = report_type(filename, content_type)
+    details = {}
+    # Read the report page by page; long reports are analyzed in chunks and merged
+    if kind == "application/pdf":
+        pages = report_pipeline.iter_pdf_pages(io.BytesIO(data))
+    else:
+        pages = report_pipeline.iter_text_pages(data)
+    if kind == "text/csv":
+        # Structured panels are pre-screened so only out-of-range rows reach the model
+        try:
+            lab_summary = lab_csv.summarize_csv(data)
+        except ValueError:
+            pass
+        else:
+            pages = [lab_summary.to_prompt_text()]
+            details["abnormal_rows"] = len(lab_summary.abnormal)
+            details["total_rows"] = lab_summary.total_rows
+            details["unscreened_rows"] = lab_summary.unscreened_rows
+
+    client = get_client()
+    with metrics.span("prompt_build", analysis="report"):
+        prompt, stats = report_pipeline.prepare_report_prompt(lambda p: client.generate(p, analysis="report"), pages)
+    result = _generate(prompt, "report", on_text, stream)
+    result.details.update(details, pages=stats.pages, chunks=stats.chunks, timings=stats.timings)
+    return result
+
+
+# FOLLOW-UPS
+
+
+def start_conversation(analysis, text):
+    """Chat history that continues from a finished analysis without resending its image or report."""
+    return [
+        {"role": "user", "parts": [FOLLOW_UP_CONTEXT.format(analysis=analysis)]},
+        {"role": "model", "parts": [text]},
+    ]
+
+
+def _fit_history(history, max_tokens):
+    # Keep the opening analysis and drop the oldest follow-up exchanges until the history fits
+    history = list(history)
+    while len(history) > 2 and model_client.estimate_prompt_tokens(history) > max_tokens:
+        del history[2:4]
+    return history
+
+
+@metrics.span("analysis", analysis="follow_up")
+def follow_up(history, question, on_text=None, stream=None):
+    """Answer a question about an earlier analysis. The exchange is appended to history."""
+    question = (question or "").strip()
+    if not question:
+        raise InvalidRequest("Please enter a question.")
+    if len(history) < 2:
+        raise InvalidRequest("Start the conversation from an analysis result.")
+    contents = _fit_history(history, config.FOLLOW_UP_HISTORY_TOKENS) + [{"role": "user", "parts": [question]}]
+    result = _generate(contents, "follow_up", on_text, stream)
+    result.details["history_turns"] = len(contents) - 1
+    history += [{"role": "user", "parts": [question]}, {"role": "model", "parts": [result.text]}]
+    return result
@@ -0,0 +1,269 @@
+import io
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import config
+import metrics
+
+try:
+    import pydicom
+    from pydicom.errors import InvalidDicomError
+    from pydicom.multival import MultiValue
+    from pydicom.uid import ImplicitVRLittleEndian
+except ImportError:  # DICOM support is optional
+    pydicom = None
+
+
+# DICOM studies are rendered to one compact 8-bit image (a single frame, or a mosaic of evenly spaced
+# frames) without ever holding the full pixel array. Native (uncompressed) pixel data is viewed in
+# place: memory-mapped when reading from a file, a zero-copy buffer view for uploaded bytes. Each
+# selected frame is strided down before it is copied, so working memory depends on the output size,
+# not on the size of the study.
+
+PIXEL_DATA_TAG = b"\xe0\x7f\x10\x00"  # (7FE0,0010) little endian
+EXPLICIT_LONG_VRS = (b"OB", b"OW", b"OD", b"OF", b"OL", b"OV", b"UN")
+
+
+@dataclass
+class RenderedStudy:
+    image: Image.Image
+    frames: int
+    frames_used: list
+    rows: int
+    columns: int
+    photometric: str
+    window: tuple = None
+    compressed: bool = False
+    decode_seconds: float = 0.0
+    peak_working_bytes: int = 0
+
+    def details(self):
+        return {
+            "dicom_frames": self.frames,
+            "dicom_frames_used": self.frames_used,
+            "dicom_size": f"{self.columns}x{self.rows}",
+            "dicom_window": self.window,
+            "dicom_compressed": self.compressed,
+            "dicom_decode_seconds": self.decode_seconds,
+            "dicom_peak_working_bytes": self.peak_working_bytes,
+        }
+
+
+def is_dicom(source):
+    # Part 10 files start with a 128-byte preamble followed by "DICM"
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fp:
+            source = fp.read(132)
+    return source[128:132] == b"DICM"
+
+
+def _require_pydicom():
+    if pydicom is None:
+        raise RuntimeError("DICOM images need the 'pydicom' package (pip install pydicom)")
+
+
+def _open(source):
+    if isinstance(source, (str, Path)):
+        return open(source, "rb")
+    return io.BytesIO(source)
+
+
+def read_header(source):
+    """Return the dataset without pixel data and the file offset where the pixel data element starts."""
+    _require_pydicom()
+    with _open(source) as fp:
+        try:
+            # force: files without the preamble and "DICM" marker are valid too; they are checked below
+            ds = pydicom.dcmread(fp, stop_before_pixels=True, force=True)
+        except (InvalidDicomError, EOFError, OSError, ValueError, KeyError) as e:
+            raise ValueError(f"Not a valid DICOM file: {e}") from e
+        offset = fp.tell()
+    if "Rows" not in ds or "Columns" not in ds:
+        raise ValueError("Not a supported image or DICOM file")
+    if "TransferSyntaxUID" not in ds.file_meta:
+        # No file meta information (e.g. an old ACR-NEMA file): DICOM's default transfer syntax applies
+        ds.file_meta.TransferSyntaxUID = ImplicitVRLittleEndian
+    return ds, offset
+
+
+def _pixel_element(source, offset):
+    """(value offset, value length) of the pixel data element at offset, or None if there is none."""
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fp:
+            fp.seek(offset)
+            head = fp.read(12)
+    else:
+        head = bytes(source[offset:offset + 12])
+    if head[:4] != PIXEL_DATA_TAG:
+        return None
+    if head[4:6] in EXPLICIT_LONG_VRS:
+        return offset + 12, int.from_bytes(head[8:12], "little")
+    return offset + 8, int.from_bytes(head[4:8], "little")
+
+
+def _native_pixels(source, ds, start, length):
+    """Zero-copy (frames, rows, columns, samples) view of uncompressed pixel data, or None for a
+    layout we do not map directly (pydicom then decodes frame by frame)."""
+    bits = ds.BitsAllocated
+    if bits not in (8, 16, 32) or not ds.file_meta.TransferSyntaxUID.is_little_endian:
+        return None
+    signed = getattr(ds, "PixelRepresentation", 0) == 1
+    dtype = np.dtype(f"<{'i' if signed else 'u'}{bits // 8}")
+    frames = int(getattr(ds, "NumberOfFrames", 1) or 1)
+    samples = int(getattr(ds, "SamplesPerPixel", 1))
+    planar = samples > 1 and getattr(ds, "PlanarConfiguration", 0) == 1
+    shape = (frames, samples, ds.Rows, ds.Columns) if planar else (frames, ds.Rows, ds.Columns, samples)
+    count = math.prod(shape)
+    if count * dtype.itemsize > length:
+        raise ValueError("DICOM pixel data is shorter than its header describes")
+
+    if isinstance(source, (str, Path)):
+        pixels = np.memmap(source, dtype=dtype, mode="r", offset=start, shape=shape)
+    else:
+        pixels = np.frombuffer(source, dtype=dtype, count=count, offset=start).reshape(shape)
+    return pixels.transpose(0, 2, 3, 1) if planar else pixels
+
+
+def _frame_indices(frames, frame, mosaic_frames):
+    if frame is not None:
+        if not 0 <= frame < frames:
+            raise ValueError(f"Frame {frame} is out of range; the study has {frames} frame(s)")
+        return [frame]
+    count = min(frames, mosaic_frames)
+    # Evenly spaced through the study, always including the middle frame for a single pick
+    if count == 1:
+        return [frames // 2]
+    return sorted({round(i * (frames - 1) / (count - 1)) for i in range(count)})
+
+
+def _mask_bits(frame, ds):
+    # Pixel cells may carry overlay bits above BitsStored; signed values are sign-extended
+    unused = frame.dtype.itemsize * 8 - getattr(ds, "BitsStored", ds.BitsAllocated)
+    if unused <= 0:
+        return frame
+    if frame.dtype.kind == "i":
+        return (frame << unused) >> unused
+    return frame & ((1 << (frame.dtype.itemsize * 8 - unused)) - 1)
+
+
+def _first(value, default=None):
+    if value is None:
+        return default
+    return float(value[0]) if isinstance(value, MultiValue) else float(value)
+
+
+def render(source, max_side=None, frame=None, mosaic_frames=None):
+    """Render a DICOM study (bytes or a file path) to an 8-bit PIL image no larger than max_side."""
+    max_side = max_side or config.IMAGE_MAX_SIDE
+    mosaic_frames = mosaic_frames or config.DICOM_MOSAIC_FRAMES
+    start = time.perf_counter()
+
+    ds, offset = read_header(source)
+    element = _pixel_element(source, offset)
+    if element is None:
+        raise ValueError("DICOM file has no pixel data")
+    start_of_pixels, length = element
+    frames = int(getattr(ds, "NumberOfFrames", 1) or 1)
+    photometric = str(getattr(ds, "PhotometricInterpretation", "MONOCHROME2"))
+    indices = _frame_indices(frames, frame, mosaic_frames)
+    grid = math.ceil(math.sqrt(len(indices)))
+    tile_side = max(1, min(max_side // grid, max(ds.Rows, ds.Columns)))
+
+    # Undefined length means encapsulated (compressed) frames
+    pixels = None if length == 0xFFFFFFFF else _native_pixels(source, ds, start_of_pixels, length)
+    # Stride to about twice the tile size before any conversion; the final resize is done by PIL
+    step = max(1, max(ds.Rows, ds.Columns) // (tile_side * 2))
+    working = 0
+    tiles = []
+    for index in indices:
+        if pixels is not None:
+            # Only the strided pixels of this frame are read and copied
+            tile = _mask_bits(np.ascontiguousarray(pixels[index][::step, ::step]), ds)
+        else:
+            # Compressed: pydicom decodes just this frame
+            with _open(source) as fp:
+                decoded = pydicom.pixels.pixel_array(fp, index=index, raw=True)
+            if decoded.ndim == 2:
+                decoded = decoded[..., None]
+            tile = np.ascontiguousarray(decoded[::step, ::step])
+            working = max(working, decoded.nbytes)
+            del decoded
+        tiles.append(tile)
+        working += tile.nbytes
+
+    color = tiles[0].shape[-1] > 1
+    window = None
+    if color:
+        if photometric != "RGB":
+            # YBR data needs pydicom's color conversion
+            tiles = [pydicom.pixels.convert_color_space(t, photometric, "RGB") for t in tiles]
+
+        def to_uint8(tile):
+            if tile.dtype == np.uint8:
+                return tile
+            return _to_uint8(tile.astype(np.float32), float(tile.min()), float(tile.max()))
+    else:
+        slope = _first(getattr(ds, "RescaleSlope", None), 1.0)
+        intercept = _first(getattr(ds, "RescaleIntercept", None), 0.0)
+        center = _first(getattr(ds, "WindowCenter", None))
+        width = _first(getattr(ds, "WindowWidth", None))
+        if center is None or not width or width <= 1:
+            # No usable preset: window on the 1st-99th percentile of a sample of the selected frames
+            sample = np.concatenate([t[::4, ::4, 0].ravel() for t in tiles]).astype(np.float32) * slope + intercept
+            low, high = np.percentile(sample, [1, 99])
+            center, width = (low + high) / 2, max(high - low, 1.0)
+        window = (round(float(center), 2), round(float(width), 2))
+        # Linear VOI function from PS3.3 C.11.2.1.2
+        lower = center - 0.5 - (width - 1) / 2
+
+        def to_uint8(tile):
+            scaled = _to_uint8(tile[..., 0].astype(np.float32) * slope + intercept, lower, lower + width - 1)
+            return 255 - scaled if photometric == "MONOCHROME1" else scaled
+
+    # One tile at a time is converted to float, so only one float copy exists at once
+    working += max(t.shape[0] * t.shape[1] * 4 * t.shape[2] for t in tiles)
+    mode = "RGB" if color else "L"
+    images = []
+    for tile in tiles:
+        image = Image.fromarray(to_uint8(tile), mode)
+        image.thumbnail((tile_side, tile_side), Image.LANCZOS)
+        images.append(image)
+
+    if len(images) == 1:
+        output = images[0]
+    else:
+        rows = math.ceil(len(images) / grid)
+        output = Image.new(mode, (grid * tile_side, rows * tile_side))
+        for position, image in enumerate(images):
+            x = (position % grid) * tile_side + (tile_side - image.width) // 2
+            y = (position // grid) * tile_side + (tile_side - image.height) // 2
+            output.paste(image, (x, y))
+    if len(images) > 1:
+        working += output.width * output.height * len(mode)
+
+    seconds = time.perf_counter() - start
+    metrics.observe("dicom_decode_seconds", seconds)
+    metrics.observe("dicom_peak_working_bytes", working)
+    metrics.observe("dicom_frames", frames)
+    return RenderedStudy(
+        image=output,
+        frames=frames,
+        frames_used=indices,
+        rows=ds.Rows,
+        columns=ds.Columns,
+        photometric=photometric,
+        window=window,
+        compressed=pixels is None,
+        decode_seconds=seconds,
+        peak_working_bytes=working,
+    )
+
+
+def _to_uint8(values, lower, upper):
+    span = max(upper - lower, 1e-6)
+    return (np.clip((values - lower) / span, 0.0, 1.0) * 255).astype(np.uint8)
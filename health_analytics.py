@@ -0,0 +1,220 @@
+import math
+
+import numpy as np
+
+import config
+
+
+# Streaming statistics over the Health Insights series. Each new reading is folded in with O(1)
+# (amortized) work: Welford mean/variance and least-squares trend over the loaded window, EWMA level
+# and variance, and a trailing time window (HEALTH_ROLLING_DAYS) kept as running sums over the
+# store's own arrays. A reading is flagged when its z-score against the trailing window exceeds
+# HEALTH_ANOMALY_Z. recompute() derives the same state with vectorized numpy for a freshly loaded
+# or imported history.
+
+DAY = 86400.0
+# Fewer trailing readings than this give no z-score
+MIN_WINDOW_READINGS = 5
+# Readings whose EWMA weight falls below this are ignored when the EWMA is rebuilt in bulk
+EWMA_CUTOFF = 1e-12
+
+
+class SeriesStats:
+    """Statistics of one metric over the (ts, values) arrays it is bound to."""
+
+    def __init__(self, ts, values, window_days, alpha, z_threshold):
+        self.ts = ts
+        self.values = values
+        self.window = window_days * DAY
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self._reset()
+
+    def _reset(self):
+        # Times are kept in days since the first reading and values shifted by the first value,
+        # so the running sums stay small and cancel little
+        self.origin = 0.0
+        self.shift = 0.0
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._mean_t = 0.0
+        self._m2_t = 0.0
+        self._c_ty = 0.0
+        self.ewma = None
+        self.ewm_var = 0.0
+        # Trailing window: readings [start, count) as running sums of y, y^2, t, t^2 and t*y
+        self.start = 0
+        self._sums = [0.0] * 5
+        self.anomalies = 0
+        self.last_z = None
+
+    def _t(self, index):
+        return (self.ts[index] - self.origin) / DAY
+
+    def _window_z(self, y):
+        n = self.count - self.start
+        if n < MIN_WINDOW_READINGS:
+            return None
+        s, q = self._sums[0], self._sums[1]
+        var = (q - s * s / n) / (n - 1)
+        if var <= 0:
+            return None
+        return (y - self.shift - s / n) / math.sqrt(var)
+
+    def _add(self, index, sign):
+        t = self._t(index)
+        y = self.values[index] - self.shift
+        sums = self._sums
+        sums[0] += sign * y
+        sums[1] += sign * y * y
+        sums[2] += sign * t
+        sums[3] += sign * t * t
+        sums[4] += sign * t * y
+
+    def push(self):
+        """Fold in the newest reading, the last element of the bound arrays."""
+        index = len(self.values) - 1
+        if index != self.count:
+            # The arrays were replaced or changed behind our back; start over from them
+            return self.recompute()
+        if index == 0:
+            self.origin = self.ts[0]
+            self.shift = self.values[0]
+        y = self.values[index]
+        t = self._t(index)
+
+        # Score the reading against the trailing window before it joins it
+        cutoff = self.ts[index] - self.window
+        while self.start < index and self.ts[self.start] < cutoff:
+            self._add(self.start, -1)
+            self.start += 1
+        self.last_z = self._window_z(y)
+        if self.last_z is not None and abs(self.last_z) > self.z_threshold:
+            self.anomalies += 1
+
+        self.count += 1
+        self._add(index, 1)
+        # Welford mean/variance, and co-moments for the least-squares slope
+        dy = y - self.mean
+        dt = t - self._mean_t
+        self.mean += dy / self.count
+        self._mean_t += dt / self.count
+        self._m2 += dy * (y - self.mean)
+        self._m2_t += dt * (t - self._mean_t)
+        self._c_ty += dt * (y - self.mean)
+
+        if self.ewma is None:
+            self.ewma = y
+        else:
+            diff = y - self.ewma
+            increment = self.alpha * diff
+            self.ewma += increment
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * increment)
+
+    def recompute(self):
+        """Rebuild every statistic from the bound arrays with vectorized numpy."""
+        self._reset()
+        window, alpha = self.window, self.alpha
+        n = len(self.values)
+        if n == 0:
+            return
+        # Copies, so the arrays are not locked against growing while numpy holds their buffers
+        ts = np.frombuffer(self.ts, dtype=np.float64).copy()
+        y = np.frombuffer(self.values, dtype=np.float64).copy()
+        self.origin, self.shift = float(ts[0]), float(y[0])
+        t = (ts - self.origin) / DAY
+
+        self.count = n
+        self.mean = float(y.mean())
+        self._mean_t = float(t.mean())
+        self._m2 = float(np.square(y - self.mean).sum())
+        self._m2_t = float(np.square(t - self._mean_t).sum())
+        self._c_ty = float(((t - self._mean_t) * (y - self.mean)).sum())
+
+        # z-score of every reading against the readings in the window before it
+        shifted = y - self.shift
+        cum = np.concatenate(([0.0], np.cumsum(shifted)))
+        cum_sq = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+        ends = np.arange(n)
+        starts = np.searchsorted(ts, ts - window, side="left")
+        starts = np.minimum(starts, ends)
+        counts = ends - starts
+        s = cum[ends] - cum[starts]
+        q = cum_sq[ends] - cum_sq[starts]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (q - s * s / counts) / (counts - 1)
+            z = (shifted - s / counts) / np.sqrt(var)
+        valid = (counts >= MIN_WINDOW_READINGS) & (var > 0)
+        self.anomalies = int(np.count_nonzero(valid & (np.abs(z) > self.z_threshold)))
+        self.last_z = float(z[-1]) if valid[-1] else None
+
+        # Trailing window state after the last reading
+        self.start = int(np.searchsorted(ts, ts[-1] - window, side="left"))
+        tail_t, tail_y = t[self.start:], shifted[self.start:]
+        self._sums = [
+            float(value) for value in
+            (tail_y.sum(), np.square(tail_y).sum(), tail_t.sum(), np.square(tail_t).sum(), (tail_t * tail_y).sum())
+        ]
+
+        # Older readings carry (1 - alpha)^k of the EWMA weight, so only the tail that still counts is replayed
+        tail = n if alpha >= 1 else min(n, math.ceil(math.log(EWMA_CUTOFF) / math.log(1 - alpha)) + 1)
+        ewma, ewm_var = float(y[n - tail]), 0.0
+        for value in y[n - tail + 1:].tolist():
+            diff = value - ewma
+            increment = alpha * diff
+            ewma += increment
+            ewm_var = (1 - alpha) * (ewm_var + diff * increment)
+        self.ewma, self.ewm_var = ewma, ewm_var
+
+    def summary(self):
+        if not self.count:
+            return None
+        n = self.count - self.start
+        s, q, st, stt, sty = self._sums
+        recent_var = (q - s * s / n) / (n - 1) if n > 1 else 0.0
+        spread = n * stt - st * st
+        return {
+            "count": self.count,
+            "last": self.values[self.count - 1],
+            "mean": self.mean,
+            "std": math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            # Least-squares trend, in units per day
+            "slope": self._c_ty / self._m2_t if self._m2_t > 0 else 0.0,
+            "recent_count": n,
+            "recent_mean": self.shift + s / n,
+            "recent_std": math.sqrt(max(recent_var, 0.0)),
+            "recent_slope": (n * sty - st * s) / spread if n > 1 and spread > 1e-12 else 0.0,
+            "ewma": self.ewma,
+            "ewm_std": math.sqrt(self.ewm_var),
+            "last_z": self.last_z,
+            "last_anomaly": self.last_z is not None and abs(self.last_z) > self.z_threshold,
+            "anomalies": self.anomalies,
+        }
+
+
+class HealthAnalytics:
+    """SeriesStats for every metric column of a HealthStore."""
+
+    def __init__(self, window_days=None, alpha=None, z_threshold=None):
+        self.window_days = window_days or config.HEALTH_ROLLING_DAYS
+        self.alpha = alpha or config.HEALTH_EWMA_ALPHA
+        self.z_threshold = z_threshold or config.HEALTH_ANOMALY_Z
+        self.series = {}
+
+    def bind(self, ts, columns):
+        self.series = {
+            name: SeriesStats(ts, values, self.window_days, self.alpha, self.z_threshold)
+            for name, values in columns.items()
+        }
+
+    def push(self):
+        for stats in self.series.values():
+            stats.push()
+
+    def recompute(self):
+        for stats in self.series.values():
+            stats.recompute()
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self.series.items()}
@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+import time
+from array import array
+
+import config
+import health_analytics
+
+
+METRICS = ["Blood Pressure", "Cholesterol", "Heart Rate"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    blood_pressure REAL NOT NULL,
+    cholesterol REAL NOT NULL,
+    heart_rate REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS readings_user_ts ON readings (user_id, ts);
+"""
+
+
+class HealthStore:
+    """Append-only time series of health readings for one user.
+
+    The loaded window lives in typed arrays (amortized O(1) appends, no per-row objects) and
+    every append is written through to SQLite as a single INSERT, so nothing is rewritten.
+    Trend statistics in `analytics` are updated with each append and rebuilt when a window loads.
+    """
+
+    def __init__(self, user_id, path=None, window_days=None):
+        self.path = path or config.HEALTH_DB_PATH
+        self.user_id = user_id
+        self.version = 0
+        self._lock = threading.Lock()
+        self.analytics = health_analytics.HealthAnalytics()
+        if str(self.path) != ":memory:":
+            config.DATA_DIR.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._reset()
+        self.load_window(window_days)
+
+    def _reset(self):
+        self.ts = array("d")
+        self.columns = {name: array("d") for name in METRICS}
+        self.analytics.bind(self.ts, self.columns)
+        self.loaded = False
+
+    def __len__(self):
+        return len(self.ts)
+
+    def nbytes(self):
+        # Allocated bytes of the in-memory window (arrays over-allocate as they grow)
+        return sum(a.buffer_info()[1] * a.itemsize for a in (self.ts, *self.columns.values()))
+
+    def release(self):
+        """Drop the in-memory window; readings stay in SQLite and load_window() brings them back."""
+        with self._lock:
+            self._reset()
+            self.version += 1
+
+    def load_window(self, window_days=None):
+        """Load only readings newer than window_days (all readings if None)."""
+        since = 0.0 if window_days is None else time.time() - window_days * 86400
+        with self._lock:
+            self.window_days = window_days
+            self._reset()
+            rows = self._db.execute(
+                "SELECT ts, blood_pressure, cholesterol, heart_rate FROM readings"
+                " WHERE user_id = ? AND ts >= ? ORDER BY ts",
+                (self.user_id, since),
+            )
+            for ts, bp, chol, hr in rows:
+                self.ts.append(ts)
+                self.columns["Blood Pressure"].append(bp)
+                self.columns["Cholesterol"].append(chol)
+                self.columns["Heart Rate"].append(hr)
+            self.analytics.recompute()
+            self.loaded = True
+            self.version += 1
+
+    def append(self, blood_pressure, cholesterol, heart_rate, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO readings (user_id, ts, blood_pressure, cholesterol, heart_rate) VALUES (?, ?, ?, ?, ?)",
+                (self.user_id, ts, blood_pressure, cholesterol, heart_rate),
+            )
+            self._db.commit()
+            # Readings arrive in time order; older imports only show up on the next load_window()
+            if self.loaded and (not self.ts or ts >= self.ts[-1]):
+                self.ts.append(ts)
+                self.columns["Blood Pressure"].append(blood_pressure)
+                self.columns["Cholesterol"].append(cholesterol)
+                self.columns["Heart Rate"].append(heart_rate)
+                self.analytics.push()
+            self.version += 1
+
+    def extend(self, rows):
+        """Bulk import (ts, blood_pressure, cholesterol, heart_rate) rows in one transaction."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO readings (user_id, ts, blood_pressure, cholesterol, heart_rate) VALUES (?, ?, ?, ?, ?)",
+                ((self.user_id, *row) for row in rows),
+            )
+            self._db.commit()
+        self.load_window(self.window_days)
+
+    def to_frame(self):
+        import numpy as np
+        import pandas as pd
+
+        # One memcpy per column; the copies also release the buffer so the arrays can keep growing
+        with self._lock:
+            data = {"Date": pd.to_datetime(np.frombuffer(self.ts, dtype=np.float64).copy(), unit="s")}
+            for name in METRICS:
+                data[name] = np.frombuffer(self.columns[name], dtype=np.float64).copy()
+        return pd.DataFrame(data, copy=False)
+
+    def close(self):
+        self._db.close()
+
+
+WINDOWS = {
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last year": 365,
+    "All time": None,
+}
@@ -0,0 +1,165 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+import config
+import dicom_pipeline
+import metrics
+import response_cache
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    digest: str
+    upload_bytes: int
+    encode_seconds: float
+    dicom: dict = None
+
+    def part(self):
+        # Inline blob accepted by generate_content alongside text parts
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+# Read size when uploads are spooled to disk
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+def content_hash(source):
+    # Files are hashed in chunks, so a large study is never read into memory at once
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fp:
+            return hashlib.file_digest(fp, "sha256").hexdigest()
+    return hashlib.sha256(source).hexdigest()
+
+
+def spool_upload(fileobj, suffix=""):
+    """Copy a file-like upload to UPLOAD_DIR in chunks, hashing as it goes; returns the path.
+
+    Files are named by content hash, so identical uploads share one file (and one job). Large
+    studies can then be passed around by path and memory-mapped instead of copied as bytes.
+    """
+    config.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(dir=config.UPLOAD_DIR, suffix=".part", delete=False) as out:
+        for chunk in iter(lambda: fileobj.read(SPOOL_CHUNK_BYTES), b""):
+            digest.update(chunk)
+            out.write(chunk)
+    path = config.UPLOAD_DIR / f"{digest.hexdigest()}{suffix}"
+    # Atomic, and refreshes the modification time of an identical earlier upload
+    os.replace(out.name, path)
+    purge_uploads()
+    return path
+
+
+def purge_uploads(older_than=None):
+    """Delete spooled uploads not written for UPLOAD_TTL_SECONDS."""
+    cutoff = time.time() - (config.UPLOAD_TTL_SECONDS if older_than is None else older_than)
+    removed = 0
+    for path in config.UPLOAD_DIR.glob("*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def preprocess(data, max_side=None, image_format=None, quality=None, frame=None, digest=None):
+    """Downscale to max_side, normalize the color mode and re-encode into a compact format.
+
+    `data` is the upload as bytes or a file path. DICOM studies are rendered first (window/level,
+    one frame or a mosaic); `frame` picks a single frame.
+    """
+    max_side = max_side or config.IMAGE_MAX_SIDE
+    image_format = (image_format or config.IMAGE_FORMAT).upper()
+    quality = quality or config.IMAGE_QUALITY
+
+    start = time.perf_counter()
+    dicom = None
+    image = None
+    if not dicom_pipeline.is_dicom(data):
+        # PIL identifies images by content, whatever the file is called
+        try:
+            image = Image.open(data if isinstance(data, (str, Path)) else io.BytesIO(data))
+        except UnidentifiedImageError:
+            # DICOM files need not start with the preamble is_dicom() looks for; let pydicom decide
+            if dicom_pipeline.pydicom is None:
+                raise
+    if image is None:
+        study = dicom_pipeline.render(data, max_side=max_side, frame=frame)
+        image, dicom = study.image, study.details()
+    else:
+        # JPEG decoders can skip straight to a reduced scale, which avoids decoding every pixel
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        if "A" in image.getbands() or image.mode == "P":
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    decoded = time.perf_counter()
+
+    out = io.BytesIO()
+    if image_format == "PNG":
+        image.save(out, format="PNG", optimize=True)
+    else:
+        image.save(out, format=image_format, quality=quality, optimize=True)
+    encoded = out.getvalue()
+    seconds = time.perf_counter() - start
+
+    upload_bytes = os.path.getsize(data) if isinstance(data, (str, Path)) else len(data)
+    metrics.observe("image_upload_bytes", upload_bytes)
+    metrics.observe("image_encoded_bytes", len(encoded))
+    metrics.observe("image_decode_seconds", decoded - start)
+    metrics.observe("image_encode_seconds", seconds - (decoded - start))
+    return PreparedImage(
+        data=encoded,
+        mime_type=Image.MIME[image_format],
+        width=image.width,
+        height=image.height,
+        digest=digest or content_hash(data),
+        upload_bytes=upload_bytes,
+        encode_seconds=seconds,
+        dicom=dicom,
+    )
+
+
+def result_key(digest, prompt, model_name, generation_config, frame=None):
+    # The raw upload hash plus everything that affects the model input or output
+    extra = {} if frame is None else {"frame": frame}
+    return response_cache.make_key(
+        "image",
+        digest=digest,
+        prompt=" ".join(prompt.split()),
+        model=model_name,
+        config=generation_config,
+        max_side=config.IMAGE_MAX_SIDE,
+        format=config.IMAGE_FORMAT,
+        quality=config.IMAGE_QUALITY,
+        **extra,
+    )
+
+
+def cached_result(digest, prompt, model_name, generation_config, frame=None):
+    # Looked up by content_hash() before decoding, so repeated uploads skip preprocessing entirely
+    key = result_key(digest, prompt, model_name, generation_config, frame)
+    text = response_cache.get_default_cache().get(key)
+    metrics.increment("image_cache_lookups_total", result="hit" if text is not None else "miss")
+    return key, text
+
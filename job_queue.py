@@ -0,0 +1,288 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+import config
+import metrics
+
+
+# Background analyses. Submitting returns a job ID immediately; worker threads claim queued jobs from
+# a SQLite table (so several server processes can share one queue file) and write progress and results
+# back to it. Pages only poll the row, so reruns and navigation never restart the work.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    input_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    payload BLOB,
+    status TEXT NOT NULL,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_input_key ON jobs (input_key, created_at);
+"""
+
+
+# Batch kinds run on their own BATCH_MAX_WORKERS threads: a batch waiting on its rate limit then never
+# holds up the single analyses every session shares the JOB_WORKERS threads for
+BATCH_KINDS = ("batch_image",)
+
+
+def input_key(kind, params, payload):
+    digest = hashlib.sha256(kind.encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    if payload is not None:
+        digest.update(payload)
+    return digest.hexdigest()
+
+
+class JobQueue:
+    def __init__(self, path=None, handlers=None, workers=None, result_ttl=None, stale_after=None, batch_workers=None):
+        self.path = str(path or config.JOB_DB_PATH)
+        self.handlers = handlers if handlers is not None else default_handlers()
+        self.result_ttl = config.JOB_RESULT_TTL_SECONDS if result_ttl is None else result_ttl
+        self.stale_after = config.JOB_STALE_SECONDS if stale_after is None else stale_after
+        self._local = threading.local()
+        # Indexed by whether a worker runs batch kinds, so a submission wakes the right pool
+        self._wakeup = {False: threading.Event(), True: threading.Event()}
+        self._stopping = False
+        # Jobs this process is running right now; requeue_stale never touches them however long they take
+        self._running = set()
+        self._maintenance_lock = threading.Lock()
+        self._next_maintenance = 0.0
+        config.DATA_DIR.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+        self.maintain()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True, name=f"job-worker-{i}")
+            for i in range(config.JOB_WORKERS if workers is None else workers)
+        ] + [
+            threading.Thread(target=self._work, args=(True,), daemon=True, name=f"job-batch-worker-{i}")
+            for i in range(config.BATCH_MAX_WORKERS if batch_workers is None else batch_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _db(self):
+        # One connection per thread; WAL lets readers poll while a worker writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    # SUBMISSION
+
+    def submit(self, kind, params=None, payload=None):
+        """Queue a job and return its ID. An identical job that is still pending, or finished within
+        the result TTL, is returned instead of starting new work."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        params = params or {}
+        key = input_key(kind, params, payload)
+        db = self._db()
+        existing = db.execute(
+            "SELECT id FROM jobs WHERE input_key = ? AND (status IN (?, ?) OR (status = ? AND finished_at >= ?))"
+            " ORDER BY created_at DESC LIMIT 1",
+            (key, QUEUED, RUNNING, DONE, time.time() - self.result_ttl),
+        ).fetchone()
+        if existing is not None:
+            metrics.increment("jobs_deduplicated_total", kind=kind)
+            return existing["id"]
+
+        job_id = uuid.uuid4().hex
+        db.execute(
+            "INSERT INTO jobs (id, kind, input_key, params, payload, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, key, json.dumps(params), payload, QUEUED, time.time()),
+        )
+        metrics.increment("jobs_submitted_total", kind=kind)
+        self._wakeup[kind in BATCH_KINDS].set()
+        return job_id
+
+    def get(self, job_id):
+        row = self._db().execute(
+            "SELECT id, kind, status, partial, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def wait(self, job_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED) or time.monotonic() >= deadline:
+                return job
+            time.sleep(0.05)
+
+    # WORKERS
+
+    def _claim(self, batch=False):
+        # Atomic claim: only one worker (in any process) can flip a given row to running
+        kinds = ", ".join("?" * len(BATCH_KINDS))
+        row = self._db().execute(
+            "UPDATE jobs SET status = ?, started_at = ? WHERE id = ("
+            f" SELECT id FROM jobs WHERE status = ? AND kind {'IN' if batch else 'NOT IN'} ({kinds})"
+            " ORDER BY created_at LIMIT 1"
+            ") AND status = ? RETURNING id, kind, params, payload",
+            (RUNNING, time.time(), QUEUED, *BATCH_KINDS, QUEUED),
+        ).fetchone()
+        return row
+
+    def _work(self, batch=False):
+        wakeup = self._wakeup[batch]
+        while not self._stopping:
+            try:
+                if not batch:
+                    self.maintain()
+                job = self._claim(batch)
+            except sqlite3.OperationalError:
+                job = None
+            if job is None:
+                wakeup.wait(config.JOB_POLL_SECONDS)
+                wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        db = self._db()
+        start = time.perf_counter()
+        last_flush = [0.0]
+
+        def on_text(text):
+            # Throttled progress so pages can show streamed text while the job runs
+            now = time.monotonic()
+            if now - last_flush[0] >= 0.5:
+                last_flush[0] = now
+                db.execute("UPDATE jobs SET partial = ? WHERE id = ?", (text, job["id"]))
+
+        self._running.add(job["id"])
+        try:
+            result = self.handlers[job["kind"]](json.loads(job["params"]), job["payload"], on_text)
+        except Exception as e:
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, payload = NULL, finished_at = ? WHERE id = ?",
+                (FAILED, str(e) or type(e).__name__, time.time(), job["id"]),
+            )
+            metrics.increment("jobs_finished_total", kind=job["kind"], status=FAILED)
+        else:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, partial = NULL, payload = NULL, finished_at = ? WHERE id = ?",
+                (DONE, json.dumps(result, default=str), time.time(), job["id"]),
+            )
+            metrics.increment("jobs_finished_total", kind=job["kind"], status=DONE)
+        finally:
+            self._running.discard(job["id"])
+        metrics.observe("job_seconds", time.perf_counter() - start, kind=job["kind"])
+
+    # MAINTENANCE
+
+    def maintain(self):
+        # Called from the worker loop; one worker per interval requeues orphans and deletes old jobs
+        now = time.monotonic()
+        if now < self._next_maintenance:
+            return
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            if now >= self._next_maintenance:
+                self._next_maintenance = now + config.JOB_MAINTENANCE_SECONDS
+                self.requeue_stale()
+                self.purge()
+        finally:
+            self._maintenance_lock.release()
+
+    def requeue_stale(self):
+        # Jobs whose worker died mid-run (e.g. a server restart) go back to the queue
+        cutoff = time.time() - self.stale_after
+        running = list(self._running)
+        self._db().execute(
+            "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at < ?"
+            f" AND id NOT IN ({', '.join('?' * len(running))})",
+            (QUEUED, RUNNING, cutoff, *running),
+        )
+
+    def purge(self, older_than=None):
+        cutoff = time.time() - (config.JOB_RETENTION_SECONDS if older_than is None else older_than)
+        self._db().execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff))
+
+    def stop(self):
+        self._stopping = True
+        for wakeup in self._wakeup.values():
+            wakeup.set()
+
+
+def _analyze_image(params, payload, on_text, before_call=None):
+    import diagnosis_core
+
+    # Large uploads (DICOM studies) are spooled to disk and passed by path instead of as a payload
+    source = params.get("path") or payload
+    return diagnosis_core.analyze_image(
+        source, on_text=on_text, frame=params.get("frame"), before_call=before_call
+    ).to_dict()
+
+
+def _analyze_batch_image(params, payload, on_text):
+    import batch_runner
+
+    # Only model calls take a rate limit token; images served from cache go straight through
+    limiter = batch_runner.get_batch_limiter()
+    return _analyze_image(params, payload, on_text, limiter.acquire if limiter is not None else None)
+
+
+def _analyze_report(params, payload, on_text):
+    import diagnosis_core
+
+    return diagnosis_core.analyze_report(payload, params["filename"], params["content_type"], on_text=on_text).to_dict()
+
+
+def _analyze_symptoms(params, payload, on_text):
+    import diagnosis_core
+
+    return diagnosis_core.analyze_symptoms(
+        params["symptoms"], params["duration"], params["severity"], on_text=on_text
+    ).to_dict()
+
+
+def default_handlers():
+    return {
+        "image": _analyze_image,
+        "batch_image": _analyze_batch_image,
+        "report": _analyze_report,
+        "symptoms": _analyze_symptoms,
+    }
+
+
+# Process-wide queue shared by every Streamlit session
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_default_queue():
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
@@ -0,0 +1,197 @@
+import io
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import config
+import metrics
+
+
+REFERENCE_RANGES_PATH = config.BASE_DIR / "reference_ranges.csv"
+
+# Accepted spellings of the columns we need from an uploaded lab CSV
+COLUMN_ALIASES = {
+    "analyte": ["analyte", "test", "test name", "test_name", "name", "parameter", "component"],
+    "value": ["value", "result", "result value", "result_value", "measurement"],
+    "unit": ["unit", "units", "uom"],
+    "low": ["low", "ref low", "ref_low", "reference low", "lower limit"],
+    "high": ["high", "ref high", "ref_high", "reference high", "upper limit"],
+}
+
+CSV_PROMPT_HEADER = """Structured lab panel (pre-screened against reference ranges).
+{summary}
+
+Out-of-range results (analyte, value, unit, reference low, reference high, direction):
+"""
+
+UNSCREENED_HEADER = """
+Results that could not be screened, as reported (analyte, value, unit, reason):
+"""
+
+UNSCREENED_COLUMNS = ["analyte", "value", "unit", "reason"]
+
+
+@dataclass
+class LabSummary:
+    total_rows: int = 0
+    matched_rows: int = 0
+    unit_mismatches: int = 0
+    unknown_analytes: set = field(default_factory=set)
+    abnormal: pd.DataFrame = None
+    # The first LAB_CSV_UNSCREENED_MAX_ROWS of unscreened_rows, verbatim
+    unscreened: pd.DataFrame = None
+    unscreened_rows: int = 0
+    seconds: float = 0.0
+
+    def summary_text(self):
+        lines = [
+            f"- Rows in report: {self.total_rows}",
+            f"- Rows checked against a reference range: {self.matched_rows}",
+            f"- Out-of-range results: {len(self.abnormal)}",
+        ]
+        if self.unit_mismatches:
+            lines.append(f"- Rows not checked because of a unit mismatch: {self.unit_mismatches}")
+        if self.unknown_analytes:
+            lines.append(f"- Analytes without a bundled reference range: {', '.join(sorted(self.unknown_analytes)[:50])}")
+        if self.unscreened_rows:
+            lines.append(f"- Rows not screened (listed below): {self.unscreened_rows}")
+        return "\n".join(lines)
+
+    def to_prompt_text(self):
+        table = self.abnormal.to_csv(index=False, header=False, float_format="%g") if len(self.abnormal) else "None\n"
+        text = CSV_PROMPT_HEADER.format(summary=self.summary_text()) + table
+        if self.unscreened_rows:
+            # Not judged here, so the model sees these exactly as reported
+            text += UNSCREENED_HEADER + self.unscreened.to_csv(index=False, header=False)
+            omitted = self.unscreened_rows - len(self.unscreened)
+            if omitted:
+                text += f"... {omitted} more unscreened rows omitted\n"
+        return text
+
+
+def _normalize(series):
+    return series.astype("string").str.strip().str.lower()
+
+
+def _normalize_unit(series):
+    return _normalize(series).str.replace("µ", "u", regex=False).str.replace(" ", "", regex=False)
+
+
+@lru_cache(maxsize=1)
+def load_reference_ranges(path=REFERENCE_RANGES_PATH):
+    ranges = pd.read_csv(path, dtype={"analyte": "string", "aliases": "string", "unit": "string"})
+    # One row per accepted name so the join is a plain equality merge
+    ranges["names"] = ranges["analyte"] + "|" + ranges["aliases"].fillna("")
+    ranges = ranges.assign(key=ranges["names"].str.split("|")).explode("key")
+    ranges["key"] = _normalize(ranges["key"])
+    ranges = ranges[ranges["key"] != ""]
+    ranges["ref_unit"] = _normalize_unit(ranges["unit"])
+    return ranges[["key", "ref_unit", "low", "high"]].drop_duplicates("key").reset_index(drop=True)
+
+
+def _resolve_columns(columns):
+    lookup = {str(column).strip().lower(): column for column in columns}
+    resolved = {}
+    for name, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lookup:
+                resolved[name] = lookup[alias]
+                break
+    if "analyte" not in resolved or "value" not in resolved:
+        raise ValueError("CSV needs an analyte/test column and a value/result column")
+    return resolved
+
+
+def flag_chunk(chunk, columns, ranges):
+    frame = pd.DataFrame({
+        "analyte": chunk[columns["analyte"]].astype("string").str.strip(),
+        "value": pd.to_numeric(chunk[columns["value"]], errors="coerce"),
+    })
+    frame["key"] = _normalize(frame["analyte"])
+    if "unit" in columns:
+        frame["unit"] = chunk[columns["unit"]].astype("string").str.strip()
+    else:
+        frame["unit"] = pd.NA
+
+    merged = frame.merge(ranges, on="key", how="left")
+    # Ranges printed on the report itself take precedence over the bundled table
+    own_range = pd.Series(False, index=merged.index)
+    for bound in ("low", "high"):
+        if bound in columns:
+            reported = pd.Series(pd.to_numeric(chunk[columns[bound]], errors="coerce").to_numpy(), index=merged.index)
+            own_range |= reported.notna()
+            merged[bound] = reported.fillna(merged[bound])
+
+    has_range = merged["low"].notna() | merged["high"].notna()
+    unit = _normalize_unit(merged["unit"])
+    unit_ok = (own_range | unit.isna() | merged["ref_unit"].isna() | (unit == merged["ref_unit"])).fillna(False)
+    checked = has_range & unit_ok & merged["value"].notna()
+
+    below = checked & (merged["value"] < merged["low"])
+    above = checked & (merged["value"] > merged["high"])
+    merged["direction"] = np.where(below, "low", "high")
+    abnormal = merged.loc[below | above, ["analyte", "value", "unit", "low", "high", "direction"]]
+
+    unknown = set(merged.loc[~has_range, "analyte"].dropna().unique())
+
+    # Rows with a value that could not be checked are kept verbatim, with the reason
+    raw_value = pd.Series(chunk[columns["value"]].astype("string").str.strip().to_numpy(), index=merged.index)
+    raw_unit = merged["unit"]
+    unscreened_mask = ~checked & merged["analyte"].notna() & raw_value.notna() & (raw_value != "")
+    reason = np.select(
+        [~has_range, merged["value"].isna()], ["no reference range", "non-numeric value"], "unit mismatch"
+    )
+    unscreened = pd.DataFrame({
+        "analyte": merged["analyte"], "value": raw_value, "unit": raw_unit, "reason": reason,
+    }).loc[unscreened_mask, UNSCREENED_COLUMNS]
+    return abnormal, int(checked.sum()), int((has_range & ~unit_ok).sum()), unknown, unscreened
+
+
+def summarize_csv(source, chunksize=None):
+    """Stream a lab CSV in chunks and keep only the out-of-range rows plus summary counts."""
+    start = time.perf_counter()
+    chunksize = chunksize or config.LAB_CSV_CHUNK_ROWS
+    ranges = load_reference_ranges()
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    max_unscreened = config.LAB_CSV_UNSCREENED_MAX_ROWS
+    summary = LabSummary()
+    abnormal_parts = []
+    unscreened_parts = []
+    kept_unscreened = 0
+    columns = None
+    for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, skipinitialspace=True):
+        if columns is None:
+            columns = _resolve_columns(chunk.columns)
+        abnormal, checked, mismatched, unknown, unscreened = flag_chunk(chunk, columns, ranges)
+        summary.total_rows += len(chunk)
+        summary.matched_rows += checked
+        summary.unit_mismatches += mismatched
+        summary.unknown_analytes |= unknown
+        summary.unscreened_rows += len(unscreened)
+        if len(abnormal):
+            abnormal_parts.append(abnormal)
+        if len(unscreened) and kept_unscreened < max_unscreened:
+            unscreened_parts.append(unscreened.head(max_unscreened - kept_unscreened))
+            kept_unscreened += len(unscreened_parts[-1])
+    if columns is None:
+        raise ValueError("CSV report is empty")
+
+    summary.abnormal = (
+        pd.concat(abnormal_parts, ignore_index=True) if abnormal_parts
+        else pd.DataFrame(columns=["analyte", "value", "unit", "low", "high", "direction"])
+    )
+    summary.unscreened = (
+        pd.concat(unscreened_parts, ignore_index=True) if unscreened_parts
+        else pd.DataFrame(columns=UNSCREENED_COLUMNS)
+    )
+    summary.seconds = time.perf_counter() - start
+    metrics.observe("lab_csv_seconds", summary.seconds)
+    metrics.increment("lab_csv_rows_total", summary.total_rows)
+    metrics.increment("lab_csv_abnormal_rows_total", len(summary.abnormal))
+    metrics.increment("lab_csv_unscreened_rows_total", summary.unscreened_rows)
+    return summary
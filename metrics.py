@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import config
+
+
+# In-process metrics registry. Counters are monotonically increasing totals, gauges hold the
+# latest value, and timings keep count/sum/max plus a bounded window of recent samples for percentiles.
+
+_SAMPLE_WINDOW = 1024
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+
+
+def _series(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def increment(name, amount=1, **labels):
+    key = _series(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    key = _series(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, value, **labels):
+    key = _series(name, labels)
+    with _lock:
+        timing = _timings.get(key)
+        if timing is None:
+            timing = _timings[key] = {"count": 0, "sum": 0.0, "max": 0.0, "samples": deque(maxlen=_SAMPLE_WINDOW)}
+        timing["count"] += 1
+        timing["sum"] += value
+        timing["max"] = max(timing["max"], value)
+        timing["samples"].append(value)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block (or, used as a decorator, each call) into `<name>_seconds` and count its
+    exceptions in `<name>_errors_total` by exception type."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        increment(f"{name}_errors_total", kind=type(e).__name__, **labels)
+        raise
+    finally:
+        observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def snapshot():
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in _counters.items()]
+        gauges = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in _gauges.items()]
+        timings = []
+        for (name, labels), timing in _timings.items():
+            samples = list(timing["samples"])
+            timings.append({
+                "name": name,
+                "labels": dict(labels),
+                "count": timing["count"],
+                "sum": timing["sum"],
+                "max": timing["max"],
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+            })
+    return {"counters": counters, "gauges": gauges, "timings": timings}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
+
+
+# PROMETHEUS EXPORT
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+def to_prometheus(prefix="mediscan_"):
+    """Render the registry in the Prometheus text exposition format; timings become summaries."""
+    data = snapshot()
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for kind, series in (("counter", data["counters"]), ("gauge", data["gauges"])):
+        for item in sorted(series, key=lambda item: item["name"]):
+            name = prefix + item["name"]
+            declare(name, kind)
+            lines.append(f"{name}{_labels(item['labels'])} {item['value']}")
+    for item in sorted(data["timings"], key=lambda item: item["name"]):
+        name = prefix + item["name"]
+        declare(name, "summary")
+        for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+            lines.append(f"{name}{_labels(item['labels'], quantile=quantile)} {item[key]}")
+        lines.append(f"{name}_sum{_labels(item['labels'])} {item['sum']}")
+        lines.append(f"{name}_count{_labels(item['labels'])} {item['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    # Write-then-rename so a scraper never reads a half-written file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(to_prometheus())
+    os.replace(tmp, path)
+
+
+_exporters_started = False
+
+
+def start_exporters():
+    """Start the file and HTTP exporters enabled in config, once per process."""
+    global _exporters_started
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    if config.METRICS_EXPORT_PATH:
+        def export_loop():
+            while True:
+                try:
+                    write_prometheus(config.METRICS_EXPORT_PATH)
+                except OSError:
+                    increment("metrics_export_errors_total", exporter="file")
+                time.sleep(config.METRICS_EXPORT_SECONDS)
+
+        threading.Thread(target=export_loop, daemon=True, name="metrics-file-export").start()
+
+    if config.METRICS_PORT:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((config.METRICS_HOST, config.METRICS_PORT), Handler)
+        except OSError:
+            # Usually the port is taken, e.g. by another worker process started with the same settings;
+            # the app keeps running without the endpoint
+            increment("metrics_export_errors_total", exporter="http")
+            return
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http-export").start()
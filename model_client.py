@@ -0,0 +1,469 @@
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import config
+import metrics
+from singleflight import SingleFlight
+
+
+class ModelError(Exception):
+    pass
+
+
+class TransientModelError(ModelError):
+    """A failure worth retrying: overload, rate limiting, dropped connections."""
+
+
+class ModelTimeoutError(TransientModelError, TimeoutError):
+    pass
+
+
+class CircuitOpenError(ModelError):
+    pass
+
+
+# BACKENDS
+
+
+class GeminiBackend:
+    def __init__(self, model_name, generation_config, safety_settings, api_key, system_instruction=None):
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        genai.configure(api_key=api_key)
+        # The system instruction is attached to the model once instead of being prepended to every prompt
+        self.system_instruction = system_instruction
+        self.model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            system_instruction=system_instruction,
+        )
+        self._transient = (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.GatewayTimeout,
+            ConnectionError,
+            TimeoutError,
+        )
+
+    def _call(self, contents, timeout, stream):
+        try:
+            return self.model.generate_content(contents, stream=stream, request_options={"timeout": timeout})
+        except self._transient as e:
+            raise TransientModelError(str(e)) from e
+
+    def _record_usage(self, response):
+        # Token counts as billed by the API; streamed responses carry them once fully consumed
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            metrics.increment("model_tokens_total", usage.prompt_token_count or 0, direction="prompt", source="reported")
+            metrics.increment("model_tokens_total", usage.candidates_token_count or 0, direction="response", source="reported")
+
+    def generate(self, contents, timeout):
+        response = self._call(contents, timeout, stream=False)
+        self._record_usage(response)
+        return response.text
+
+    def stream(self, contents, timeout):
+        try:
+            response = self._call(contents, timeout, stream=True)
+            for chunk in response:
+                # Chunks that only carry safety/finish metadata raise on .text
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue
+                if text:
+                    yield text
+            self._record_usage(response)
+        except self._transient as e:
+            raise TransientModelError(str(e)) from e
+
+
+class StubBackend:
+    """In-process backend with configurable latency and error rate, for tests and benchmarks."""
+
+    def __init__(self, latency=0.5, jitter=0.0, error_rate=0.0, chunks=8, seed=None, system_instruction=None):
+        self.system_instruction = system_instruction
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.chunks = chunks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.expovariate(1 / self.jitter) if self.jitter else 0.0)
+            fail = self._random.random() < self.error_rate
+        return delay, fail
+
+    def _respond(self, contents):
+        size = sum(len(p) if isinstance(p, str) else len(p.get("data", b"")) if isinstance(p, dict) else 0 for p in iter_parts(contents))
+        turns = len(contents) if isinstance(contents, list) and contents and "role" in contents[0] else 1
+        return (
+            f"**Stub analysis** of a {size}-byte request ({turns} turn(s), "
+            f"{'with' if self.system_instruction else 'no'} system instruction).\n\n"
+            "1. No model was called; this text comes from the local stub backend.\n"
+            "2. Potential implications: not assessed.\n"
+            "3. Next steps: consult a healthcare provider.\n"
+            "4. Urgency level: routine."
+        )
+
+    def generate(self, contents, timeout):
+        delay, fail = self._draw()
+        if delay > timeout:
+            time.sleep(timeout)
+            raise ModelTimeoutError(f"stub call exceeded {timeout:.2f}s")
+        time.sleep(delay)
+        if fail:
+            raise TransientModelError("stub backend injected failure")
+        return self._respond(contents)
+
+    def stream(self, contents, timeout):
+        delay, fail = self._draw()
+        text = self._respond(contents)
+        step = max(1, len(text) // self.chunks)
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        for index, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            if fail and index == len(pieces) // 2:
+                raise TransientModelError("stub backend injected failure")
+            yield piece
+
+
+# RESILIENCE
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one probe through after `reset_seconds`."""
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at >= self.reset_seconds and not self._probing:
+                self._probing = True
+                return
+        metrics.increment("model_circuit_rejections_total")
+        raise CircuitOpenError("The AI service is temporarily unavailable. Please try again shortly.")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    metrics.increment("model_circuit_opened_total")
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """End a call that neither succeeded nor failed (e.g. an abandoned stream) without changing state;
+        if it was the half-open probe, the next call probes again."""
+        with self._lock:
+            self._probing = False
+
+
+class ModelClient:
+    """Deadlines, retries with jittered exponential backoff, optional hedging and a circuit breaker
+    around a backend exposing generate(contents, timeout) and stream(contents, timeout)."""
+
+    def __init__(self, backend, timeout=60.0, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 hedge_after=None, breaker=None, max_workers=32, coalesce=True, max_prompt_tokens=None):
+        self.backend = backend
+        # The backend's system instruction is billed with every call, so it counts against the budget
+        self.system_tokens = estimate_tokens(backend.system_instruction) if getattr(backend, "system_instruction", None) else 0
+        self.max_prompt_tokens = max_prompt_tokens
+        # Identical concurrent requests (from any session) share a single upstream call
+        self.coalesce = coalesce
+        self._flights = SingleFlight("model-generate")
+        self._stream_flights = SingleFlight("model-stream")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def prompt_tokens(self, contents):
+        """Estimated prompt tokens of one call, system instruction included."""
+        return estimate_prompt_tokens(contents) + self.system_tokens
+
+    def fit(self, contents, analysis="generic"):
+        """Trim the longest text part of contents until the call fits max_prompt_tokens."""
+        if not self.max_prompt_tokens:
+            return contents
+        over = self.prompt_tokens(contents) - self.max_prompt_tokens
+        if over <= 0:
+            return contents
+        metrics.increment("model_prompt_trimmed_total", analysis=analysis)
+        return trim_contents(contents, over)
+
+    def generate(self, contents, timeout=None, analysis="generic"):
+        contents = self.fit(contents, analysis)
+        key = request_key(contents) if self.coalesce else None
+        if key is None:
+            return self._generate(contents, timeout, analysis)
+        try:
+            return self._flights.do(key, lambda: self._generate(contents, timeout, analysis), timeout or self.timeout)
+        except TimeoutError as e:
+            if isinstance(e, ModelError):
+                raise
+            raise ModelTimeoutError(str(e)) from e
+
+    def stream(self, contents, timeout=None, analysis="generic"):
+        contents = self.fit(contents, analysis)
+        key = request_key(contents) if self.coalesce else None
+        if key is None:
+            return self._stream(contents, timeout, analysis)
+        return self._shared_stream(key, contents, timeout, analysis)
+
+    def _shared_stream(self, key, contents, timeout, analysis):
+        try:
+            yield from self._stream_flights.stream(key, lambda: self._stream(contents, timeout, analysis), timeout or self.timeout)
+        except TimeoutError as e:
+            if isinstance(e, ModelError):
+                raise
+            raise ModelTimeoutError(str(e)) from e
+
+    def _generate(self, contents, timeout=None, analysis="generic"):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            start = time.perf_counter()
+            try:
+                text = self._attempt(contents, deadline)
+            except TransientModelError as e:
+                self.breaker.record_failure()
+                metrics.increment("model_call_errors_total", analysis=analysis, kind=type(e).__name__)
+                pause = self._backoff(attempt)
+                attempt += 1
+                if attempt > self.max_retries or time.monotonic() + pause >= deadline:
+                    raise
+                metrics.increment("model_call_retries_total", analysis=analysis)
+                time.sleep(pause)
+                continue
+            except Exception as e:
+                # Not retryable (bad request, blocked content); the service itself is healthy
+                self.breaker.record_success()
+                metrics.increment("model_call_errors_total", analysis=analysis, kind=type(e).__name__)
+                raise
+            self.breaker.record_success()
+            metrics.observe("model_call_seconds", time.perf_counter() - start, analysis=analysis)
+            record_usage(contents, len(text), analysis, self.system_tokens)
+            return text
+
+    def _attempt(self, contents, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ModelTimeoutError("model call deadline exceeded")
+        futures = {self._pool.submit(self.backend.generate, contents, remaining)}
+        if self.hedge_after and self.hedge_after < remaining:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                # Slow primary: race a second identical request and take whichever finishes first
+                metrics.increment("model_hedged_requests_total")
+                futures.add(self._pool.submit(self.backend.generate, contents, deadline - time.monotonic()))
+
+        error = None
+        while futures:
+            done, futures = wait(futures, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise ModelTimeoutError("model call deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _stream(self, contents, timeout=None, analysis="generic"):
+        # No retries here: once text has been shown it cannot be taken back. Callers fall back to generate().
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self.breaker.before_call()
+        start = time.perf_counter()
+        size = 0
+        settled = False
+        try:
+            for piece in self.backend.stream(contents, max(0.0, deadline - time.monotonic())):
+                if time.monotonic() > deadline:
+                    raise ModelTimeoutError("model stream deadline exceeded")
+                size += len(piece)
+                yield piece
+        except TransientModelError as e:
+            settled = True
+            self.breaker.record_failure()
+            metrics.increment("model_call_errors_total", analysis=analysis, kind=type(e).__name__)
+            raise
+        except Exception as e:
+            # Not retryable (bad request, blocked content); the service itself is healthy
+            settled = True
+            self.breaker.record_success()
+            metrics.increment("model_call_errors_total", analysis=analysis, kind=type(e).__name__)
+            raise
+        else:
+            settled = True
+            self.breaker.record_success()
+            metrics.observe("model_stream_seconds", time.perf_counter() - start, analysis=analysis)
+            record_usage(contents, size, analysis, self.system_tokens)
+        finally:
+            # Closed early (GeneratorExit from the consumer or SingleFlight): no verdict, but a
+            # half-open probe must not stay claimed or the breaker never closes again
+            if not settled:
+                self.breaker.release()
+
+
+# TOKEN BUDGET
+
+
+# Roughly four characters per token for English prose
+CHARS_PER_TOKEN = 4
+# Gemini bills every inline image as a fixed number of tokens, whatever its size
+IMAGE_TOKENS = 258
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def iter_parts(contents):
+    """Text and blob parts of a request, which is a prompt, a list of parts or a list of chat turns."""
+    for item in contents if isinstance(contents, list) else [contents]:
+        if isinstance(item, dict) and "parts" in item:
+            yield from item["parts"]
+        else:
+            yield item
+
+
+def estimate_prompt_tokens(contents):
+    tokens = 0
+    for part in iter_parts(contents):
+        if isinstance(part, str):
+            tokens += estimate_tokens(part)
+        elif isinstance(part, dict):
+            tokens += IMAGE_TOKENS
+    return tokens
+
+
+def trim_contents(contents, tokens):
+    """Copy of contents with about `tokens` tokens cut from the end of its longest text part."""
+    texts = [part for part in iter_parts(contents) if isinstance(part, str)]
+    if not texts:
+        return contents
+    longest = max(texts, key=len)
+    trimmed = longest[:max(0, len(longest) - tokens * CHARS_PER_TOKEN)] + "\n[...truncated to fit the prompt budget]"
+
+    def replace(part):
+        if part is longest:
+            return trimmed
+        if isinstance(part, dict) and "parts" in part:
+            return {**part, "parts": [replace(p) for p in part["parts"]]}
+        return part
+
+    if not isinstance(contents, list):
+        return trimmed
+    return [replace(item) for item in contents]
+
+
+def record_usage(contents, response_chars, analysis, system_tokens=0):
+    """Count prompt and response sizes of one successful upstream call."""
+    prompt_chars = 0
+    blob_bytes = 0
+    for part in iter_parts(contents):
+        if isinstance(part, str):
+            prompt_chars += len(part)
+        elif isinstance(part, dict):
+            blob_bytes += len(part.get("data") or b"")
+    metrics.increment("model_prompt_chars_total", prompt_chars, analysis=analysis)
+    metrics.increment("model_response_chars_total", response_chars, analysis=analysis)
+    if blob_bytes:
+        metrics.increment("model_prompt_blob_bytes_total", blob_bytes, analysis=analysis)
+    prompt_tokens = estimate_prompt_tokens(contents) + system_tokens
+    metrics.observe("model_prompt_tokens", prompt_tokens, analysis=analysis)
+    metrics.increment("model_tokens_total", prompt_tokens, direction="prompt", source="estimated")
+    metrics.increment("model_tokens_total", response_chars // CHARS_PER_TOKEN + 1, direction="response", source="estimated")
+
+
+def request_key(contents):
+    """Digest of a request's text and inline blob parts, or None if it holds anything else."""
+    digest = hashlib.sha256()
+    for item in contents if isinstance(contents, list) else [contents]:
+        if isinstance(item, dict) and "parts" in item:
+            # Chat turns: the same text said by a different role is a different request
+            digest.update(f"role:{item.get('role')}:{len(item['parts'])}:".encode())
+            parts = item["parts"]
+        else:
+            parts = [item]
+        for part in parts:
+            if not _digest_part(digest, part):
+                return None
+    return digest.hexdigest()
+
+
+def _digest_part(digest, part):
+    if isinstance(part, str):
+        data = part.encode("utf-8")
+        digest.update(b"text:%d:" % len(data))
+    elif isinstance(part, dict) and isinstance(part.get("data"), bytes):
+        data = part["data"]
+        digest.update(f"blob:{part.get('mime_type')}:{len(data)}:".encode())
+    else:
+        return False
+    digest.update(data)
+    return True
+
+
+def build_backend(model_name, generation_config, safety_settings, api_key, system_instruction=None):
+    if config.MODEL_BACKEND == "stub":
+        return StubBackend(
+            latency=config.STUB_LATENCY_SECONDS, error_rate=config.STUB_ERROR_RATE, system_instruction=system_instruction
+        )
+    return GeminiBackend(model_name, generation_config, safety_settings, api_key, system_instruction)
+
+
+def build_client(model_name, generation_config, safety_settings, api_key, backend=None, system_instruction=None):
+    return ModelClient(
+        backend or build_backend(model_name, generation_config, safety_settings, api_key, system_instruction),
+        timeout=config.MODEL_TIMEOUT_SECONDS,
+        max_retries=config.MODEL_MAX_RETRIES,
+        hedge_after=config.MODEL_HEDGE_AFTER_SECONDS or None,
+        breaker=CircuitBreaker(config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_SECONDS),
+        coalesce=config.MODEL_COALESCE,
+        max_prompt_tokens=config.MODEL_MAX_PROMPT_TOKENS,
+    )
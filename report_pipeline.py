@@ -0,0 +1,215 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import config
+import metrics
+from model_client import estimate_tokens
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF support is optional
+    PdfReader = None
+
+
+REPORT_PROMPT = """
+Analyze this medical report and provide:
+1. Summary of key abnormal findings
+2. Potential health implications
+3. Recommended follow-up actions
+4. General health advice
+
+Report content:
+{report_text}
+"""
+
+MAP_PROMPT = """
+You are reviewing part {index} of a longer medical report.
+List every abnormal or clinically notable finding in this excerpt as short bullet points,
+including the test name, value, unit and reference range when present.
+Reply with "No notable findings" if there are none.
+
+Excerpt:
+{chunk}
+"""
+
+COLLAPSE_PROMPT = """
+Merge these partial findings from the same medical report into one de-duplicated bullet list.
+Keep every abnormal value, test name, unit and reference range.
+
+Partial findings:
+{findings}
+"""
+
+REDUCE_PROMPT = """
+The findings below were extracted from a {pages}-page medical report, section by section.
+Using only these findings, provide:
+1. Summary of key abnormal findings
+2. Potential health implications
+3. Recommended follow-up actions
+4. General health advice
+
+Extracted findings:
+{findings}
+"""
+
+
+@dataclass
+class PipelineStats:
+    pages: int = 0
+    chunks: int = 0
+    characters: int = 0
+    max_in_flight: int = 0
+    timings: dict = field(default_factory=dict)
+
+
+# EXTRACTION
+
+
+def iter_pdf_pages(stream):
+    """Yield the text of each PDF page in turn; no page text is kept after it has been yielded."""
+    if PdfReader is None:
+        raise RuntimeError("PDF reports need the 'pypdf' package (pip install pypdf)")
+    reader = PdfReader(stream)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def iter_text_pages(data, encoding="utf-8", lines_per_page=200):
+    page = []
+    for line in data.decode(encoding, errors="replace").splitlines():
+        page.append(line)
+        if len(page) >= lines_per_page:
+            yield "\n".join(page)
+            page = []
+    if page:
+        yield "\n".join(page)
+
+
+# CHUNKING
+
+
+def iter_chunks(pages, max_tokens, stats=None):
+    """Pack page text into chunks of at most max_tokens, splitting on paragraph and line boundaries."""
+    max_chars = max_tokens * 4
+    buffer = []
+    size = 0
+    for page in pages:
+        if stats is not None:
+            stats.pages += 1
+            stats.characters += len(page)
+        for block in _split_blocks(page, max_chars):
+            if size + len(block) > max_chars and buffer:
+                yield "\n".join(buffer)
+                buffer, size = [], 0
+            buffer.append(block)
+            size += len(block) + 1
+    if buffer:
+        yield "\n".join(buffer)
+
+
+def _split_blocks(text, max_chars):
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) <= max_chars:
+            if paragraph.strip():
+                yield paragraph
+            continue
+        line_block = []
+        line_size = 0
+        for line in paragraph.splitlines():
+            while len(line) > max_chars:
+                yield line[:max_chars]
+                line = line[max_chars:]
+            if line_size + len(line) > max_chars and line_block:
+                yield "\n".join(line_block)
+                line_block, line_size = [], 0
+            line_block.append(line)
+            line_size += len(line) + 1
+        if line_block:
+            yield "\n".join(line_block)
+
+
+# MAP / REDUCE
+
+
+def map_chunks(generate, chunks, max_workers, stats):
+    # Keep at most 2 * max_workers chunks in memory so huge reports stream through
+    findings = {}
+    pending = {}
+    limit = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for index, chunk in enumerate(chunks, start=1):
+            stats.chunks += 1
+            if len(pending) >= limit:
+                _collect(wait(pending, return_when=FIRST_COMPLETED).done, pending, findings)
+            pending[pool.submit(generate, MAP_PROMPT.format(index=index, chunk=chunk))] = index
+            stats.max_in_flight = max(stats.max_in_flight, len(pending))
+        _collect(list(pending), pending, findings)
+    return [findings[index] for index in sorted(findings)]
+
+
+def _collect(done, pending, findings):
+    for future in done:
+        findings[pending.pop(future)] = future.result()
+
+
+def collapse_findings(generate, findings, max_tokens):
+    # Merge groups of partial findings until the whole list fits in one prompt
+    while estimate_tokens("\n\n".join(findings)) > max_tokens and len(findings) > 1:
+        groups = []
+        group = []
+        for item in findings:
+            if group and estimate_tokens("\n\n".join(group + [item])) > max_tokens:
+                groups.append(group)
+                group = []
+            group.append(item)
+        groups.append(group)
+        if len(groups) == len(findings):
+            # Every finding already fills a prompt on its own; merge pairwise instead
+            groups = [findings[i:i + 2] for i in range(0, len(findings), 2)]
+        findings = [generate(COLLAPSE_PROMPT.format(findings="\n\n".join(group))) for group in groups]
+    return findings
+
+
+def prepare_report_prompt(generate, pages, max_tokens=None, max_workers=None):
+    """Return the final analysis prompt for a report plus per-stage stats.
+
+    Reports that fit in one chunk are sent whole. Longer reports are split into token-budgeted
+    chunks whose findings are extracted concurrently (map) and merged into a single prompt (reduce).
+    """
+    max_tokens = max_tokens or config.REPORT_CHUNK_TOKENS
+    max_workers = max_workers or config.REPORT_MAP_WORKERS
+    stats = PipelineStats()
+
+    start = time.perf_counter()
+    chunks = iter_chunks(pages, max_tokens, stats)
+    first = next(chunks, "")
+    second = next(chunks, None)
+    if second is None:
+        stats.chunks = 1
+        stats.timings["extract"] = time.perf_counter() - start
+        _record(stats)
+        return REPORT_PROMPT.format(report_text=first), stats
+
+    def all_chunks():
+        yield first
+        yield second
+        yield from chunks
+
+    # Extraction is interleaved with the map stage, so its time is counted there
+    findings = map_chunks(generate, all_chunks(), max_workers, stats)
+    stats.timings["extract_and_map"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    findings = collapse_findings(generate, findings, max_tokens)
+    stats.timings["collapse"] = time.perf_counter() - start
+
+    _record(stats)
+    return REDUCE_PROMPT.format(pages=stats.pages, findings="\n\n".join(findings)), stats
+
+
+def _record(stats):
+    for stage, seconds in stats.timings.items():
+        metrics.observe("report_stage_seconds", seconds, stage=stage)
+    metrics.observe("report_pages", stats.pages)
+    metrics.observe("report_chunks", stats.chunks)
@@ -0,0 +1,390 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import config
+import metrics
+
+
+# KEYS
+
+
+def make_key(namespace, **parts):
+    # Canonical JSON so that equal requests always hash the same way
+    canonical = json.dumps({"ns": namespace, **parts}, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def symptom_key(symptoms, duration, severity, model_name, generation_config):
+    return make_key(
+        "symptoms",
+        symptoms=sorted(set(symptoms)),
+        duration=duration,
+        severity=severity,
+        model=model_name,
+        config=generation_config,
+    )
+
+
+# STORES
+
+
+class DiskStore:
+    """One JSON file per key. Writes go through a temp file and os.replace so readers never see partial entries."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total_bytes = sum(p.stat().st_size for p in self.directory.glob("*.json"))
+        self.evictions = 0
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry["value"], entry["stored_at"]
+
+    def set(self, key, value, stored_at):
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        payload = json.dumps({"value": value, "stored_at": stored_at})
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._total_bytes += len(payload.encode("utf-8")) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+    def _evict(self):
+        # Drop the least recently written entries until we are back under 90% of the budget
+        files = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        self._total_bytes = sum(p.stat().st_size for p in files)
+        target = self.max_bytes * 0.9
+        for path in files:
+            if self._total_bytes <= target:
+                break
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for path in self.directory.glob("*.json"):
+                path.unlink(missing_ok=True)
+            self._total_bytes = 0
+
+    def size_bytes(self):
+        return self._total_bytes
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('total_bytes', 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'total_bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size - OLD.size WHERE name = 'total_bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'total_bytes';
+END;
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteStore:
+    """All entries in one SQLite file in WAL mode, shared by every worker process on the host.
+
+    Each write is one transaction, and triggers keep the total size exact across processes, so the
+    byte budget holds for the whole deployment rather than per process. Eviction drops the least
+    recently read entries.
+    """
+
+    # Reads refresh an entry's access time at most this often, so lookups rarely need a write
+    ACCESS_RESOLUTION_SECONDS = 60
+
+    def __init__(self, path, max_bytes):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.evictions = 0
+        self._db().executescript(_SQLITE_SCHEMA)
+
+    def _db(self):
+        # One connection per thread; WAL lets every process read while one writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        db = self._db()
+        row = db.execute("SELECT value, stored_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] >= self.ACCESS_RESOLUTION_SECONDS:
+            # Never wait for the write lock on a read; if another process holds it the entry just looks older
+            db.execute("PRAGMA busy_timeout = 0")
+            try:
+                db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                db.execute("PRAGMA busy_timeout = 30000")
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        payload = json.dumps(value)
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT INTO entries (key, value, stored_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at,"
+                " accessed_at = excluded.accessed_at, size = excluded.size",
+                (key, payload, stored_at, time.time(), len(payload.encode("utf-8"))),
+            )
+            if self._total(db) > self.max_bytes:
+                self._evict(db)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _total(self, db):
+        return db.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def _evict(self, db):
+        # Drop the least recently read entries until we are back under 90% of the budget
+        target = self.max_bytes * 0.9
+        while self._total(db) > target:
+            deleted = db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT 32)"
+            ).rowcount
+            if not deleted:
+                break
+            self.evictions += deleted
+
+    def delete(self, key):
+        self._db().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        self._db().execute("DELETE FROM entries")
+
+    def size_bytes(self):
+        return self._total(self._db())
+
+    def report_worker(self, worker, hits, misses):
+        self._db().execute(
+            "INSERT INTO workers (worker, hits, misses, updated_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(worker) DO UPDATE SET hits = excluded.hits, misses = excluded.misses,"
+            " updated_at = excluded.updated_at",
+            (worker, hits, misses, time.time()),
+        )
+
+    def worker_stats(self):
+        rows = self._db().execute("SELECT worker, hits, misses, updated_at FROM workers ORDER BY worker").fetchall()
+        return [
+            {
+                "worker": worker,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "updated_at": updated_at,
+            }
+            for worker, hits, misses, updated_at in rows
+        ]
+
+
+# CACHE
+
+
+class ResponseCache:
+    """In-memory LRU in front of an optional persistent store, with TTL expiry and hit/miss counters."""
+
+    # How often this process publishes its hit/miss totals to a shared store
+    REPORT_SECONDS = 10
+
+    def __init__(self, max_items=config.CACHE_MEMORY_ITEMS, ttl_seconds=config.CACHE_TTL_SECONDS, store=None,
+                 name="responses"):
+        # Labels this cache's metrics, so other caches built on this class are counted apart
+        self.name = name
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._reported_at = 0.0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _fresh(self, stored_at):
+        return self.ttl_seconds is None or time.time() - stored_at < self.ttl_seconds
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self._fresh(stored_at):
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                else:
+                    del self._items[key]
+                    self.expired += 1
+                    entry = None
+        if entry is not None:
+            self._record("memory_hit")
+            return value
+
+        if self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self._fresh(stored_at):
+                    with self._lock:
+                        self._remember(key, value, stored_at)
+                        self.hits += 1
+                        self.disk_hits += 1
+                    self._record("store_hit")
+                    return value
+                self.store.delete(key)
+                with self._lock:
+                    self.expired += 1
+
+        with self._lock:
+            self.misses += 1
+        self._record("miss")
+        return None
+
+    def _record(self, result):
+        metrics.increment("response_cache_lookups_total", cache=self.name, result=result)
+        report_worker = getattr(self.store, "report_worker", None)
+        now = time.monotonic()
+        if report_worker is None or now - self._reported_at < self.REPORT_SECONDS:
+            return
+        self._reported_at = now
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        metrics.set_gauge("response_cache_hit_rate", hits / (hits + misses), cache=self.name)
+        try:
+            report_worker(self.worker, hits, misses)
+        except sqlite3.OperationalError:
+            self._reported_at = 0.0
+
+    def set(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, value, stored_at)
+        if self.store is not None:
+            self.store.set(key, value, stored_at)
+
+    def _remember(self, key, value, stored_at):
+        self._items[key] = (value, stored_at)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._items),
+                "memory_evictions": self.evictions,
+                "disk_bytes": self.store.size_bytes() if self.store is not None else 0,
+                "disk_evictions": self.store.evictions if self.store is not None else 0,
+                "backend": type(self.store).__name__ if self.store is not None else "memory",
+                "worker": self.worker,
+            }
+
+
+def build_store(backend=None):
+    backend = backend or config.CACHE_BACKEND
+    if backend == "sqlite":
+        return SQLiteStore(config.CACHE_DB_PATH, config.CACHE_DISK_MAX_BYTES)
+    if backend == "disk":
+        return DiskStore(config.CACHE_DIR, config.CACHE_DISK_MAX_BYTES)
+    if backend == "memory":
+        return None
+    raise ValueError(f"Unknown cache backend: {backend!r} (expected sqlite, disk or memory)")
+
+
+# Process-wide instance shared by every Streamlit session
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(store=build_store())
+        return _default_cache
@@ -0,0 +1,194 @@
+import io
+import sys
+import threading
+import time
+import weakref
+from array import array
+
+import config
+import metrics
+
+
+# Approximate accounting of what each Streamlit session keeps alive, with per-session and global
+# byte budgets. Artifacts are held by weak reference, so a session that ends simply drops out.
+# Under pressure the least recently used artifacts are asked to release their memory through their
+# evict callback (e.g. HealthStore.release, which drops the in-memory window; it is reloaded from
+# SQLite when next needed). Artifacts without a callback are counted but never evicted. Plain session
+# state (dicts, lists) cannot be weakly referenced, so it is tracked through a Slot.
+
+
+def estimate_size(obj):
+    """Approximate bytes held by obj: buffers, arrays, DataFrames and PIL images; shallow size otherwise."""
+    nbytes = getattr(obj, "nbytes", None)
+    if nbytes is not None:
+        # numpy arrays and memoryviews expose an attribute, our stores a method
+        return int(nbytes() if callable(nbytes) else nbytes)
+    if isinstance(obj, array):
+        return obj.buffer_info()[1] * obj.itemsize
+    if isinstance(obj, (bytes, bytearray, str)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    if isinstance(obj, io.BytesIO):
+        return obj.getbuffer().nbytes
+    if hasattr(obj, "memory_usage"):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if hasattr(obj, "getbands") and hasattr(obj, "size"):
+        width, height = obj.size
+        return width * height * len(obj.getbands())
+    return sys.getsizeof(obj)
+
+
+class Slot:
+    """Holder for session state tracked by the registry. Evicting it (release) may happen on any
+    thread: the value is dropped and `released` set, for the session to notice on its next run.
+
+    `size` reports bytes held elsewhere on the slot's behalf (e.g. uploads kept by Streamlit) instead
+    of estimating the value; on_release(value) frees them.
+    """
+
+    def __init__(self, value=None, size=None, on_release=None):
+        self.value = value
+        self.size = size
+        self.on_release = on_release
+        self.released = False
+
+    def nbytes(self):
+        return estimate_size(self.value) if self.size is None else self.size
+
+    def release(self):
+        value, self.value = self.value, None
+        self.released = True
+        if self.on_release is not None:
+            self.on_release(value)
+        self.size = 0 if self.size is not None else None
+
+
+class _Artifact:
+    __slots__ = ("ref", "evict", "last_used", "size", "evicted")
+
+    def __init__(self, ref, evict):
+        self.ref = ref
+        self.evict = evict
+        self.last_used = time.monotonic()
+        self.size = 0
+        self.evicted = False
+
+
+class SessionMemory:
+    def __init__(self, session_budget=None, total_budget=None):
+        self.session_budget = session_budget or config.SESSION_MAX_BYTES
+        self.total_budget = total_budget or config.SESSION_TOTAL_MAX_BYTES
+        self._sessions = {}
+        self._lock = threading.Lock()
+        # Filled by weakref callbacks, which may run inside the garbage collector at any point,
+        # so they only queue the artifact and the registry drops it on its next pass
+        self._dead = []
+        self.evictions = 0
+
+    def track(self, session_id, name, obj, evict=None):
+        """Register (or mark as used) an artifact a session holds. evict(obj) should free its memory."""
+        with self._lock:
+            self._drop_dead()
+            artifacts = self._sessions.setdefault(session_id, {})
+            artifact = artifacts.get(name)
+            if artifact is None or artifact.ref() is not obj:
+                ref = weakref.ref(obj, lambda _, key=(session_id, name): self._dead.append(key))
+                artifact = artifacts[name] = _Artifact(ref, evict)
+            artifact.last_used = time.monotonic()
+            artifact.evicted = False
+
+    def _drop_dead(self):
+        while self._dead:
+            session_id, name = self._dead.pop()
+            artifacts = self._sessions.get(session_id, {})
+            artifact = artifacts.get(name)
+            if artifact is not None and artifact.ref() is None:
+                del artifacts[name]
+            if not artifacts:
+                self._sessions.pop(session_id, None)
+
+    def _measure(self):
+        # Sizes change as artifacts grow, so they are re-estimated on every pass
+        for artifacts in self._sessions.values():
+            for artifact in artifacts.values():
+                obj = artifact.ref()
+                artifact.size = 0 if obj is None or artifact.evicted else estimate_size(obj)
+
+    def enforce(self):
+        """Evict least recently used artifacts of sessions over their budget, then globally."""
+        victims = []
+        with self._lock:
+            self._drop_dead()
+            self._measure()
+            for artifacts in self._sessions.values():
+                over = sum(a.size for a in artifacts.values()) - self.session_budget
+                victims += self._pick(artifacts.values(), over, "session")
+            everything = [a for artifacts in self._sessions.values() for a in artifacts.values()]
+            over = sum(a.size for a in everything if not a.evicted) - self.total_budget
+            victims += self._pick(everything, over, "global")
+
+        for artifact, reason in victims:
+            obj = artifact.ref()
+            if obj is None:
+                continue
+            artifact.evict(obj)
+            self.evictions += 1
+            metrics.increment("session_memory_evictions_total", reason=reason)
+        self._publish()
+        return len(victims)
+
+    def _pick(self, candidates, over, reason):
+        victims = []
+        if over <= 0:
+            return victims
+        evictable = sorted(
+            (a for a in candidates if a.evict is not None and not a.evicted and a.size),
+            key=lambda a: a.last_used,
+        )
+        for artifact in evictable:
+            if over <= 0:
+                break
+            artifact.evicted = True
+            over -= artifact.size
+            victims.append((artifact, reason))
+        return victims
+
+    def _publish(self):
+        with self._lock:
+            total = sum(a.size for artifacts in self._sessions.values() for a in artifacts.values() if not a.evicted)
+            sessions = len(self._sessions)
+        metrics.set_gauge("session_memory_bytes", total)
+        metrics.set_gauge("session_memory_sessions", sessions)
+
+    def usage(self):
+        """Per-session bytes, largest first, as measured by the last enforce()."""
+        now = time.monotonic()
+        with self._lock:
+            self._drop_dead()
+            rows = [
+                {
+                    "session": session_id,
+                    "bytes": sum(a.size for a in artifacts.values() if not a.evicted),
+                    "artifacts": {name: 0 if a.evicted else a.size for name, a in artifacts.items()},
+                    "idle_seconds": round(now - max(a.last_used for a in artifacts.values()), 1),
+                }
+                for session_id, artifacts in self._sessions.items() if artifacts
+            ]
+        return sorted(rows, key=lambda row: row["bytes"], reverse=True)
+
+
+# Process-wide registry shared by every Streamlit session
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_default_registry():
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = SessionMemory()
+        return _default_registry
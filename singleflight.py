@@ -0,0 +1,144 @@
+import threading
+import time
+
+import metrics
+
+
+class StreamAbandoned(Exception):
+    """Raised to late joiners of a shared stream whose upstream stopped because nobody was listening."""
+
+
+class _Flight:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.value = None
+        self.done = False
+        self.error = None
+        self.waiters = 0
+
+    def publish(self, piece):
+        with self.cond:
+            self.chunks.append(piece)
+            self.cond.notify_all()
+
+    def finish(self, value=None, error=None):
+        with self.cond:
+            self.value = value
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls so they share one upstream call.
+
+    The upstream call runs on its own thread rather than on the first caller's, so a caller that
+    times out or is cancelled (e.g. a Streamlit rerun) simply stops waiting while everyone else still
+    gets the result. Finished flights are forgotten immediately: errors are delivered only to callers
+    that were already waiting, and the next identical call starts fresh.
+    """
+
+    def __init__(self, name="default"):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key, start_upstream):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            flight.waiters += 1
+        metrics.increment("singleflight_calls_total", group=self.name, role="leader" if leader else "follower")
+        if leader:
+            threading.Thread(target=start_upstream, args=(key, flight), daemon=True, name=f"singleflight-{self.name}").start()
+        return flight
+
+    def _leave(self, flight):
+        with flight.cond:
+            flight.waiters -= 1
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def do(self, key, fn, timeout=None):
+        """Return fn() for the first caller of key; concurrent callers with the same key share it."""
+
+        def upstream(key, flight):
+            try:
+                value = fn()
+            except BaseException as e:
+                self._forget(key, flight)
+                flight.finish(error=e)
+            else:
+                self._forget(key, flight)
+                flight.finish(value=value)
+
+        flight = self._join(key, upstream)
+        try:
+            with flight.cond:
+                if not flight.cond.wait_for(lambda: flight.done, timeout):
+                    raise TimeoutError(f"timed out waiting for shared call {self.name!r}")
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+        finally:
+            self._leave(flight)
+
+    def stream(self, key, fn, timeout=None):
+        """Yield the pieces of the iterator returned by fn(), shared with concurrent callers of key.
+
+        Late joiners first receive every piece produced so far. Upstream iteration stops early once
+        no caller is listening any more.
+        """
+
+        def upstream(key, flight):
+            iterator = None
+            try:
+                iterator = fn()
+                for piece in iterator:
+                    flight.publish(piece)
+                    with flight.cond:
+                        abandoned = flight.waiters == 0
+                    if abandoned:
+                        # Anyone joining right now must not mistake the truncated output for a full one
+                        metrics.increment("singleflight_abandoned_total", group=self.name)
+                        raise StreamAbandoned(f"shared stream {self.name!r} was abandoned")
+            except BaseException as e:
+                self._forget(key, flight)
+                flight.finish(error=e)
+            else:
+                self._forget(key, flight)
+                flight.finish()
+            finally:
+                close = getattr(iterator, "close", None) if iterator is not None else None
+                if close is not None:
+                    close()
+
+        flight = self._join(key, upstream)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    ready = flight.cond.wait_for(
+                        lambda: len(flight.chunks) > index or flight.done,
+                        None if deadline is None else max(0.0, deadline - time.monotonic()),
+                    )
+                    if not ready:
+                        raise TimeoutError(f"timed out waiting for shared stream {self.name!r}")
+                    pieces = flight.chunks[index:]
+                    finished = flight.done
+                    error = flight.error
+                index += len(pieces)
+                yield from pieces
+                if finished and index >= len(flight.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            self._leave(flight)
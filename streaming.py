@@ -0,0 +1,57 @@
+import time
+from dataclasses import dataclass
+
+import metrics
+from model_client import CircuitOpenError
+
+
+@dataclass
+class GenerationResult:
+    text: str
+    first_chunk_seconds: float
+    total_seconds: float
+    streamed: bool
+
+
+def generate(client, contents, on_text=None, stream=True, analysis="generic"):
+    """Run a generation, passing the accumulated text to on_text as chunks arrive.
+
+    If streaming is disabled, unsupported or fails part-way, the partial output is discarded
+    and the blocking call is used instead, so callers always end up with a complete response.
+    """
+    start = time.perf_counter()
+    first_chunk = None
+
+    if stream:
+        text = ""
+        try:
+            for piece in client.stream(contents, analysis=analysis):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                text += piece
+                if on_text is not None:
+                    on_text(text)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            metrics.increment("stream_fallbacks_total", analysis=analysis)
+        else:
+            if text:
+                total = time.perf_counter() - start
+                _record(analysis, first_chunk, total, streamed=True)
+                return GenerationResult(text, first_chunk, total, streamed=True)
+            metrics.increment("stream_fallbacks_total", analysis=analysis)
+
+    text = client.generate(contents, analysis=analysis)
+    total = time.perf_counter() - start
+    if on_text is not None:
+        on_text(text)
+    # Without streaming the first visible output arrives with the full response
+    _record(analysis, total, total, streamed=False)
+    return GenerationResult(text, total, total, streamed=False)
+
+
+def _record(analysis, first_chunk, total, streamed):
+    mode = "stream" if streamed else "blocking"
+    metrics.observe("generation_first_chunk_seconds", first_chunk, analysis=analysis, mode=mode)
+    metrics.observe("generation_total_seconds", total, analysis=analysis, mode=mode)
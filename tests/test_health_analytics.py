@@ -0,0 +1,55 @@
+import random
+from array import array
+
+import pytest
+
+import health_analytics
+
+
+def seeded_series(n, seed=7):
+    """Irregularly spaced readings around a slow trend, with a few spikes."""
+    rng = random.Random(seed)
+    ts, values = [], []
+    now = 1_700_000_000.0
+    for i in range(n):
+        now += rng.uniform(0.1, 2.0) * health_analytics.DAY
+        value = 120 + 0.05 * i + rng.gauss(0, 4)
+        if rng.random() < 0.03:
+            value += rng.choice((-1, 1)) * 30
+        ts.append(now)
+        values.append(value)
+    return ts, values
+
+
+def assert_summaries_match(pushed, bulk):
+    assert pushed.keys() == bulk.keys()
+    for key, expected in bulk.items():
+        if isinstance(expected, float):
+            assert pushed[key] == pytest.approx(expected, rel=1e-7, abs=1e-7), key
+        else:
+            assert pushed[key] == expected, key
+
+
+def test_push_matches_recompute_on_seeded_series():
+    ts_values, readings = seeded_series(300)
+    ts, values = array("d"), array("d")
+    pushed = health_analytics.SeriesStats(ts, values, window_days=30, alpha=0.3, z_threshold=2.5)
+    bulk = health_analytics.SeriesStats(ts, values, window_days=30, alpha=0.3, z_threshold=2.5)
+    for t, value in zip(ts_values, readings):
+        ts.append(t)
+        values.append(value)
+        pushed.push()
+        bulk.recompute()
+        assert_summaries_match(pushed.summary(), bulk.summary())
+    assert pushed.summary()["anomalies"] > 0
+
+
+def test_push_after_arrays_replaced_recomputes():
+    ts_values, readings = seeded_series(50, seed=3)
+    ts, values = array("d", ts_values), array("d", readings)
+    stats = health_analytics.SeriesStats(ts, values, window_days=14, alpha=0.2, z_threshold=3.0)
+    stats.push()
+    assert stats.count == len(values)
+    fresh = health_analytics.SeriesStats(ts, values, window_days=14, alpha=0.2, z_threshold=3.0)
+    fresh.recompute()
+    assert_summaries_match(stats.summary(), fresh.summary())
@@ -0,0 +1,65 @@
+import pytest
+
+import model_client
+
+
+class ScriptedBackend:
+    """Streams `pieces`, then raises `error` if one is given."""
+
+    def __init__(self, pieces=("a", "b", "c"), error=None):
+        self.pieces = pieces
+        self.error = error
+
+    def stream(self, contents, timeout):
+        yield from self.pieces
+        if self.error is not None:
+            raise self.error
+
+
+def half_open_client(backend):
+    breaker = model_client.CircuitBreaker(failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    return model_client.ModelClient(backend, breaker=breaker, coalesce=False)
+
+
+def test_stream_probe_success_closes_breaker():
+    client = half_open_client(ScriptedBackend())
+    assert "".join(client.stream(["hi"])) == "abc"
+    assert client.breaker.state == "closed"
+
+
+def test_stream_probe_transient_error_reopens_breaker():
+    client = half_open_client(ScriptedBackend(error=model_client.TransientModelError("unavailable")))
+    with pytest.raises(model_client.TransientModelError):
+        list(client.stream(["hi"]))
+    assert client.breaker.opened_at is not None
+    assert not client.breaker._probing
+
+
+def test_stream_probe_non_transient_error_settles_probe():
+    client = half_open_client(ScriptedBackend(error=ValueError("blocked")))
+    with pytest.raises(ValueError):
+        list(client.stream(["hi"]))
+    assert client.breaker.state == "closed"
+    assert not client.breaker._probing
+
+
+def test_abandoned_stream_probe_is_released():
+    client = half_open_client(ScriptedBackend())
+    stream = client.stream(["hi"])
+    assert next(stream) == "a"
+    stream.close()
+    assert not client.breaker._probing
+    # The next call is let through as a fresh probe instead of being rejected forever
+    assert "".join(client.stream(["hi"])) == "abc"
+    assert client.breaker.state == "closed"
+
+
+def test_abandoned_shared_stream_probe_is_released():
+    client = half_open_client(ScriptedBackend())
+    client.coalesce = True
+    stream = client.stream(["hi"])
+    assert next(stream) == "a"
+    stream.close()
+    assert not client.breaker._probing
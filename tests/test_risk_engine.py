@@ -0,0 +1,53 @@
+import io
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import risk_engine
+
+
+def original_score(age, bmi, smoker, activity):
+    """The Risk Assessment page's original four-factor rule, kept here as the reference."""
+    score = 0
+    score += 1 if age > 50 else 0
+    score += 1 if bmi >= 30 else 0
+    score += 1 if smoker == "Yes" else 0
+    score += 1 if activity == "Low" else 0
+    if score <= 1:
+        return score, "Low"
+    if score == 2:
+        return score, "Moderate"
+    return score, "High"
+
+
+def test_score_one_matches_original_thresholds():
+    # Values on and either side of each threshold, over every page option
+    ages = (10, 50, 51, 90)
+    bmis = (10.0, 29.9, 30.0, 50.0)
+    for case in itertools.product(ages, bmis, ("No", "Yes"), ("Low", "Moderate", "High")):
+        assert risk_engine.score_one(*case) == original_score(*case), case
+
+
+def roster(n, seed=11):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "age": rng.integers(18, 90, n),
+        "bmi": rng.uniform(16, 42, n).round(1),
+        "smoker": rng.choice(["Yes", "no", " y ", "Never", ""], n),
+        "activity": rng.choice(["Low", "moderate", "Sedentary", "High"], n),
+    })
+
+
+def test_score_csv_matches_score_frame():
+    frame = roster(1000)
+    source = io.StringIO(frame.to_csv(index=False))
+    output = io.StringIO()
+    summary = risk_engine.score_csv(source, output, chunksize=128)
+
+    expected = risk_engine.score_frame(pd.read_csv(io.StringIO(frame.to_csv(index=False))))
+    scored = pd.read_csv(io.StringIO(output.getvalue()))
+    assert summary["rows"] == len(frame)
+    assert scored["risk_score"].tolist() == expected["risk_score"].tolist()
+    assert scored["risk_level"].tolist() == expected["risk_level"].tolist()
+    assert summary["levels"] == expected["risk_level"].value_counts().reindex(risk_engine.LEVELS, fill_value=0).to_dict()